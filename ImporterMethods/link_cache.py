@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from app import app
+from frappe_api import get_async_client, io_loop
+
+# Link existence lookups are the bulk of validation traffic and the same values
+# repeat across rows and across uploads. Values are resolved in chunks with a
+# single get_list call per chunk and remembered per connection. The chunks of
+# all Link columns of an upload chunk go out at once on the asyncio transport,
+# bounded by the site's FRAPPE_ASYNC_MAX_CONNECTIONS.
+
+
+class LinkCache:
+    """LRU cache with TTL of (doctype, name) -> exists for one Frappe site."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doctype, name):
+        key = (doctype, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            exists, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return exists
+
+    def set(self, doctype, name, exists):
+        key = (doctype, name)
+        with self._lock:
+            self._entries[key] = (exists, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_link_cache(connection_id):
+    with _caches_lock:
+        if connection_id not in _caches:
+            _caches[connection_id] = LinkCache(app.config["LINK_CACHE_SIZE"], app.config["LINK_CACHE_TTL"])
+        return _caches[connection_id]
+
+
+def resolve_many(conn, lookups):
+    """resolve_links for each (doctype, values) of lookups, concurrently.
+
+    Returns the existing values per lookup, in order, or the exception that
+    lookup raised.
+    """
+    if not lookups:
+        return []
+
+    async def resolve_all():
+        return await asyncio.gather(
+            *(resolve_links(conn, doctype, values) for doctype, values in lookups), return_exceptions=True)
+    return io_loop.run(resolve_all())
+
+
+async def resolve_links(conn, doctype, values):
+    """Return the subset of values that exist as names of doctype on the site."""
+    cache = get_link_cache(conn.id)
+    existing = set()
+    misses = []
+    for value in values:
+        exists = cache.get(doctype, value)
+        if exists is None:
+            misses.append(value)
+        elif exists:
+            existing.add(value)
+
+    chunk_size = app.config["LINK_LOOKUP_CHUNK_SIZE"]
+    chunks = [misses[start:start + chunk_size] for start in range(0, len(misses), chunk_size)]
+    client = get_async_client(conn)
+    responses = await asyncio.gather(
+        *(client.get_list(doctype, filters=[["name", "in", chunk]], fields=["name"]) for chunk in chunks))
+    for chunk, response in zip(chunks, responses):
+        if not response.ok:
+            raise Exception(f"Failed to look up {doctype}: {response.text}")
+
+        # Frappe matches names case-insensitively (MariaDB collation)
+        found = {row["name"].casefold() for row in response.json().get("message") or []}
+        for value in chunk:
+            exists = value.casefold() in found
+            cache.set(doctype, value, exists)
+            if exists:
+                existing.add(value)
+    return existing
+
+
+def mark_existing(connection_id, doctype, names):
+    cache = get_link_cache(connection_id)
+    for name in names:
+        cache.set(doctype, str(name), True)
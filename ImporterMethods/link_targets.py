@@ -0,0 +1,70 @@
+import json
+
+from app import app
+from frappe_api import get_async_client, get_client, io_loop
+from frappe_api.schema_cache import get_doctype_schema
+from import_engine.dispatch import get_throttle, send_batch_isolating
+from ImporterMethods.link_cache import mark_existing
+
+# Link values missing on the site (e.g. the Customer Groups named in a
+# Customer upload) are collected over the whole file during validation and
+# then created here with insert_many, IMPORT_MAX_BATCH_SIZE docs per request,
+# for any Link doctype. The doc for a name is built from the target's meta:
+# the field its "field:<fieldname>" autoname takes the name from, or the name
+# itself for Prompt naming, plus the root node as parent for tree doctypes.
+# Rejected names are isolated by bisection and reported per name.
+
+
+def create_link_targets(conn, doctype, names):
+    """Create a doctype record for each name; returns {name: error} for those that failed."""
+    try:
+        build_doc = _doc_builder(conn, doctype)
+    except Exception as e:
+        return {name: str(e) for name in names}
+
+    throttle = get_throttle(conn.id)
+    client = get_async_client(conn)
+    failed = {}
+    chunk_size = app.config["IMPORT_MAX_BATCH_SIZE"]
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        docs = [build_doc(name) for name in chunk]
+        name_of = {id(doc): name for doc, name in zip(docs, chunk)}
+        try:
+            _, _, failures = io_loop.run(send_batch_isolating(throttle, client, docs))
+        except Exception as e:
+            failed.update({name: str(e) for name in chunk})
+            continue
+
+        rejected = {name_of[id(doc)]: message for doc, message in failures}
+        failed.update(rejected)
+        mark_existing(conn.id, doctype, [name for name in chunk if name not in rejected])
+    return failed
+
+
+def _doc_builder(conn, doctype):
+    meta = json.loads(get_doctype_schema(conn, doctype).meta)['docs'][0]
+    autoname = (meta.get('autoname') or '').strip()
+
+    base = {"doctype": doctype}
+    if meta.get('is_tree'):
+        parent_field = meta.get('nsm_parent_field') or f"parent_{doctype.replace(' ', '_').lower()}"
+        root = _tree_root(conn, doctype, parent_field)
+        if root:
+            base[parent_field] = root
+
+    if autoname.startswith('field:'):
+        fieldname = autoname[len('field:'):].strip()
+        return lambda name: {**base, fieldname: name}
+    if autoname.lower() == 'prompt':
+        return lambda name: {**base, "name": name, "__newname": name}
+    raise Exception(f"{doctype} records can't be created by name (autoname '{autoname or 'hash'}')")
+
+
+def _tree_root(conn, doctype, parent_field):
+    response = get_client(conn).get_list(
+        doctype, filters=[[parent_field, "is", "not set"]], fields=["name"], limit_page_length=1)
+    if not response.ok:
+        raise Exception(f"Failed to look up the root {doctype}: {response.text}")
+    rows = response.json().get('message') or []
+    return rows[0]['name'] if rows else None
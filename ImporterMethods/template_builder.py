@@ -0,0 +1,142 @@
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from app import app
+from frappe_api import get_client
+from frappe_api.schema_cache import get_doctype_schema
+from template_handlers import get_template_handler
+
+# Templates are built in memory and cached as xlsx bytes per (connection,
+# doctype, selected fields, schema version), so repeated downloads neither
+# rebuild the workbook nor touch the disk. Besides the Template sheet, a
+# Validation sheet lists the options of Select fields and up to
+# TEMPLATE_LINK_SUGGESTIONS existing names per Link field; the template's
+# columns get drop-downs on them. Select values outside the options are
+# rejected by Excel, Link values are only suggestions (new names may be
+# created on upload). Cached templates expire after TEMPLATE_CACHE_TTL so the
+# suggestions follow the site.
+
+TEMPLATE_SHEET = 'Template'
+VALIDATION_SHEET = 'Validation'
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_template_bytes(conn, doctype, selected_fields):
+    """xlsx template for the doctype's selected fields, from the cache when fresh."""
+    entry = get_doctype_schema(conn, doctype)
+    fields_hash = hashlib.sha1(json.dumps(sorted(set(selected_fields))).encode()).hexdigest()
+    key = (conn.id, doctype, fields_hash, entry.modified)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[1] > time.monotonic():
+            _cache.move_to_end(key)
+            return cached[0]
+
+    content = build_template(conn, doctype, selected_fields, entry)
+    with _cache_lock:
+        _cache[key] = (content, time.monotonic() + app.config["TEMPLATE_CACHE_TTL"])
+        _cache.move_to_end(key)
+        while len(_cache) > app.config["TEMPLATE_CACHE_SIZE"]:
+            _cache.popitem(last=False)
+    return content
+
+
+def build_template(conn, doctype, selected_fields, entry):
+    field_map = json.loads(entry.field_map)
+    select_options = _select_options(json.loads(entry.meta))
+
+    # Columns follow the doctype's field order; headers carry the type for the upload
+    columns = []
+    choices = {}
+    for field_name, field_type in field_map.items():
+        if field_name not in selected_fields or not isinstance(field_type, str):
+            continue
+        base_type, _, options = field_type.partition(' [')
+        options = options[:-1]
+        if base_type.endswith('Link') and options:
+            column = f"{field_name} [{base_type}] [{options}]"
+            if base_type == 'Link':
+                choices[column] = (_link_suggestions(conn, options), False)
+        elif base_type == 'Select' and options:
+            column = f"{field_name} [{base_type}] [{options}]"
+            choices[column] = (select_options.get(field_name, []), True)
+        else:
+            column = f"{field_name} [{base_type}]"
+        columns.append(column)
+
+    # Get processed fields from handler if available
+    handler = get_template_handler(doctype)
+    if handler:
+        columns = handler.get_fields(columns)
+
+    workbook = Workbook()
+    template = workbook.active
+    template.title = TEMPLATE_SHEET
+    template.append(columns)
+    validation = workbook.create_sheet(VALIDATION_SHEET)
+
+    last_row = app.config["TEMPLATE_VALIDATION_ROWS"] + 1
+    list_column = 0
+    for position, column in enumerate(columns, start=1):
+        values, strict = choices.get(column, ([], False))
+        if not values:
+            continue
+        list_column += 1
+        letter = get_column_letter(list_column)
+        validation.cell(row=1, column=list_column, value=column)
+        for row, value in enumerate(values, start=2):
+            validation.cell(row=row, column=list_column, value=value)
+
+        rule = DataValidation(
+            type='list',
+            formula1=f"={VALIDATION_SHEET}!${letter}$2:${letter}${len(values) + 1}",
+            allow_blank=True,
+            showErrorMessage=strict
+        )
+        if strict:
+            rule.error = f"Choose one of the options listed on the {VALIDATION_SHEET} sheet"
+        template.add_data_validation(rule)
+        target = get_column_letter(position)
+        rule.add(f"{target}2:{target}{last_row}")
+
+    if not list_column:
+        workbook.remove(validation)
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _select_options(meta):
+    options = {}
+    for field in meta['docs'][0].get('fields', []):
+        if isinstance(field, dict) and field.get('fieldtype') == 'Select':
+            options[field['fieldname']] = [
+                option for option in (field.get('options') or '').split('\n') if option.strip()
+            ]
+    return options
+
+
+def _link_suggestions(conn, doctype):
+    try:
+        response = get_client(conn).get_list(
+            doctype, fields=["name"], limit_page_length=app.config["TEMPLATE_LINK_SUGGESTIONS"])
+        if not response.ok:
+            logging.warning(f"No {doctype} suggestions for the template: {response.text}")
+            return []
+        return [row['name'] for row in response.json().get('message') or []]
+    except Exception as e:
+        logging.warning(f"No {doctype} suggestions for the template: {str(e)}")
+        return []
@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ImporterMethods.Customer import get_field_mapping
+from ImporterMethods.link_cache import resolve_many
+from ImporterMethods.link_targets import create_link_targets
+
+ColumnSpec = namedtuple('ColumnSpec', ['key', 'fieldname', 'fieldtype', 'options', 'choices'])
+
+
+def parse_columns(columns):
+    """Parse the template headers once into the Select/Link columns to check."""
+    specs = []
+    for key in columns:
+        fieldname, fieldtype, options = get_field_mapping(key)
+        if fieldtype == 'Select' and options:
+            specs.append(ColumnSpec(key, fieldname, fieldtype, options, frozenset(options.split(', '))))
+        elif fieldtype == 'Link' and options:
+            specs.append(ColumnSpec(key, fieldname, fieldtype, options, None))
+    return specs
+
+
+def _link_values(values, row_numbers):
+    """Non-empty values of a Link column as text, with their row numbers."""
+    present = values.notna().to_numpy()
+    text = values[present].astype(str)
+    filled = (text != '').to_numpy()
+    return text[filled], row_numbers[present][filled]
+
+
+class ValidationErrors:
+    """Per-row/per-column errors kept as arrays and only rendered at the end."""
+
+    def __init__(self):
+        self._rows = []
+        self._messages = []
+
+    def __bool__(self):
+        return bool(self._rows)
+
+    def add(self, rows, messages):
+        if len(rows):
+            self._rows.append(np.asarray(rows))
+            self._messages.append(np.asarray(messages, dtype=object))
+
+    def by_row(self):
+        if not self._rows:
+            return []
+        rows = np.concatenate(self._rows)
+        messages = np.concatenate(self._messages)
+        # Stable sort keeps the column order of errors within a row
+        order = np.argsort(rows, kind='stable')
+        rows, messages = rows[order], messages[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        return [
+            {"row": int(rows[start]), "errors": messages[start:end].tolist()}
+            for start, end in zip(starts, np.r_[starts[1:], len(rows)])
+        ]
+
+    def render(self):
+        return "".join(
+            f"<b>Row {entry['row']}:</b><br>{''.join(message + '<br>' for message in entry['errors'])}<br>"
+            for entry in self.by_row()
+        )
+
+
+class ColumnValidator:
+    """Validates upload chunks column by column.
+
+    Select values are checked with a vectorized isin against the option set and
+    Link values are resolved once per distinct value through the link cache, so
+    the cost scales with columns x unique values instead of rows x columns.
+    With create_missing, Link values missing on the site are collected instead
+    of reported and created in bulk by create_missing_links() once the whole
+    file has been validated.
+    """
+
+    def __init__(self, conn, columns, create_missing=False, deferred_links=()):
+        self.conn = conn
+        self.create_missing = create_missing
+        # Link targets imported by an earlier step of a migration plan don't
+        # exist on the site yet; Frappe checks those links on insert
+        self.specs = [
+            spec for spec in parse_columns(columns)
+            if not (spec.fieldtype == 'Link' and spec.options in deferred_links)
+        ]
+        self.errors = ValidationErrors()
+        # (spec, row numbers, values) of Link values to create
+        self._missing = []
+
+    def validate(self, chunk, row_offset=0):
+        row_numbers = np.arange(row_offset + 1, row_offset + len(chunk) + 1)
+        links = []
+        for spec in self.specs:
+            values = chunk[spec.key]
+            if spec.fieldtype == 'Select':
+                self._validate_select(spec, values, row_numbers)
+            else:
+                text, rows = _link_values(values, row_numbers)
+                if len(text):
+                    links.append((spec, text, rows))
+
+        # The lookups of every Link column are sent together
+        lookups = resolve_many(self.conn, [(spec.options, text.unique().tolist()) for spec, text, _ in links])
+        for (spec, text, rows), existing in zip(links, lookups):
+            self._validate_link(spec, text, rows, existing)
+        return self.errors
+
+    def _validate_select(self, spec, values, row_numbers):
+        present = values.notna().to_numpy()
+        text = values[present].astype(str)
+        invalid = ~text.isin(spec.choices).to_numpy()
+        if invalid.any():
+            self.errors.add(
+                row_numbers[present][invalid],
+                [f"Invalid value '{value}' for field '{spec.fieldname}'. Valid options are: {spec.options}. "
+                 for value in text[invalid]]
+            )
+
+    def _validate_link(self, spec, text, rows, existing):
+        if isinstance(existing, Exception):
+            self.errors.add(rows, [f"Error validating link for {spec.fieldname}:{str(existing)} "] * len(rows))
+            return
+
+        missing = ~text.isin(existing).to_numpy()
+        if not missing.any():
+            return
+
+        if self.create_missing:
+            self._missing.append((spec, rows[missing], text[missing]))
+        else:
+            self.errors.add(
+                rows[missing],
+                [f"Invalid value '{value}' for field '{spec.fieldname}'." for value in text[missing]]
+            )
+
+    def missing_links(self):
+        """{doctype: number of distinct missing names} that create_missing_links() would create."""
+        names = {}
+        for spec, _, values in self._missing:
+            names.setdefault(spec.options, set()).update(values.str.casefold().unique())
+        return {doctype: len(keys) for doctype, keys in names.items()}
+
+    def create_missing_links(self):
+        """Create every missing Link target collected by validate(), one bulk insert per doctype.
+
+        Values are deduplicated across the file (case-insensitively, as Frappe
+        names are); rows whose value couldn't be created get an error. Nothing
+        is created for an upload that is rejected for other errors anyway.
+        """
+        if self.errors:
+            return self.errors
+
+        names = {}
+        for spec, _, values in self._missing:
+            for value in pd.unique(values):
+                names.setdefault(spec.options, {}).setdefault(value.casefold(), value)
+
+        failed = {}
+        for doctype, by_key in names.items():
+            errors = create_link_targets(self.conn, doctype, list(by_key.values()))
+            failed[doctype] = {name.casefold(): error for name, error in errors.items()}
+
+        for spec, rows, values in self._missing:
+            errors = failed[spec.options]
+            keys = values.str.casefold()
+            failed_mask = keys.isin(errors).to_numpy()
+            self.errors.add(
+                rows[failed_mask],
+                [f"Error creating {spec.options} '{value}': {errors[key]}"
+                 for value, key in zip(values[failed_mask], keys[failed_mask])]
+            )
+        self._missing = []
+        return self.errors
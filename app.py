@@ -1,10 +1,15 @@
 
 import os
 import logging
+import sqlite3
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 
 logging.basicConfig(level=logging.DEBUG)
@@ -14,7 +19,7 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 app = Flask(__name__)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'))
 
 CORS(app, resources={
     r"/*": {
@@ -26,12 +31,80 @@ CORS(app, resources={
 })
 
 app.secret_key = os.environ.get("FLASK_SECRET_KEY") or "frappe-importer-secret-key"
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///frappe_importer.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///frappe_importer.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
-    "pool_pre_ping": True,
 }
+# WAL lets status reads proceed while an import worker writes; NORMAL only
+# syncs at checkpoints, which is safe in WAL mode. busy_timeout makes writers
+# wait for the lock instead of failing with "database is locked".
+app.config["SQLITE_JOURNAL_MODE"] = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Progress of a running job is written every N acknowledged batches or T ms,
+# and always when the job changes state
+app.config["JOB_FLUSH_EVERY_BATCHES"] = int(os.environ.get("JOB_FLUSH_EVERY_BATCHES", 10))
+app.config["JOB_FLUSH_INTERVAL_MS"] = int(os.environ.get("JOB_FLUSH_INTERVAL_MS", 1000))
+app.config["FRAPPE_POOL_SIZE"] = int(os.environ.get("FRAPPE_POOL_SIZE", 16))
+app.config["FRAPPE_CONNECT_TIMEOUT"] = float(os.environ.get("FRAPPE_CONNECT_TIMEOUT", 10))
+app.config["FRAPPE_READ_TIMEOUT"] = float(os.environ.get("FRAPPE_READ_TIMEOUT", 300))
+app.config["FRAPPE_HTTP_RETRIES"] = int(os.environ.get("FRAPPE_HTTP_RETRIES", 3))
+app.config["FRAPPE_RETRY_BACKOFF_MAX"] = float(os.environ.get("FRAPPE_RETRY_BACKOFF_MAX", 10))
+# Stock Frappe does not inflate gzip request bodies; only enable behind a proxy that does
+app.config["FRAPPE_GZIP_MIN_BYTES"] = int(os.environ.get("FRAPPE_GZIP_MIN_BYTES", 0))
+# Requests on the wire per site for the asyncio transport (import batches, link lookups)
+app.config["FRAPPE_ASYNC_MAX_CONNECTIONS"] = int(os.environ.get("FRAPPE_ASYNC_MAX_CONNECTIONS", 32))
+# Threads encoding insert_many bodies for the asyncio transport, off its event loop
+app.config["FRAPPE_ENCODE_THREADS"] = int(os.environ.get("FRAPPE_ENCODE_THREADS", 4))
+app.config["SCHEMA_CHECK_INTERVAL"] = int(os.environ.get("SCHEMA_CHECK_INTERVAL", 60))
+app.config["SCHEMA_MAX_AGE"] = int(os.environ.get("SCHEMA_MAX_AGE", 24 * 60 * 60))
+app.config["LINK_CACHE_SIZE"] = int(os.environ.get("LINK_CACHE_SIZE", 100000))
+app.config["LINK_CACHE_TTL"] = int(os.environ.get("LINK_CACHE_TTL", 300))
+app.config["LINK_LOOKUP_CHUNK_SIZE"] = int(os.environ.get("LINK_LOOKUP_CHUNK_SIZE", 100))
+# Generated templates are cached per (connection, doctype, fields, schema
+# version); the Link suggestions in them are at most TEMPLATE_CACHE_TTL seconds old
+app.config["TEMPLATE_CACHE_SIZE"] = int(os.environ.get("TEMPLATE_CACHE_SIZE", 64))
+app.config["TEMPLATE_CACHE_TTL"] = int(os.environ.get("TEMPLATE_CACHE_TTL", 300))
+app.config["TEMPLATE_LINK_SUGGESTIONS"] = int(os.environ.get("TEMPLATE_LINK_SUGGESTIONS", 500))
+app.config["TEMPLATE_VALIDATION_ROWS"] = int(os.environ.get("TEMPLATE_VALIDATION_ROWS", 5000))
+# Uploads are parsed once into a cache shared by identical files (see import_engine.parsed_cache)
+app.config["PARSED_CACHE_MAX_BYTES"] = int(os.environ.get("PARSED_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+app.config["IMPORT_READ_CHUNK_SIZE"] = int(os.environ.get("IMPORT_READ_CHUNK_SIZE", 5000))
+app.config["IMPORT_WORKERS"] = int(os.environ.get("IMPORT_WORKERS", 4))
+# Default and upper limit of an import's max_inflight option
+app.config["IMPORT_MAX_INFLIGHT_PER_JOB"] = int(os.environ.get("IMPORT_MAX_INFLIGHT_PER_JOB", 4))
+app.config["IMPORT_MAX_INFLIGHT_PER_CONNECTION"] = int(os.environ.get("IMPORT_MAX_INFLIGHT_PER_CONNECTION", 8))
+app.config["IMPORT_MAX_RETRIES"] = int(os.environ.get("IMPORT_MAX_RETRIES", 5))
+app.config["IMPORT_STALE_AFTER"] = int(os.environ.get("IMPORT_STALE_AFTER", 15 * 60))
+app.config["IMPORT_BACKOFF_BASE"] = float(os.environ.get("IMPORT_BACKOFF_BASE", 1.0))
+app.config["IMPORT_BACKOFF_MAX"] = float(os.environ.get("IMPORT_BACKOFF_MAX", 60.0))
+# Batch size starts from the upload heuristic and is then tuned per job so one
+# insert_many takes about IMPORT_TARGET_BATCH_SECONDS and stays under
+# IMPORT_MAX_BATCH_BYTES. frappe.client.insert_many rejects more than 200 docs.
+app.config["IMPORT_ADAPTIVE_BATCHING"] = os.environ.get("IMPORT_ADAPTIVE_BATCHING", "1") == "1"
+app.config["IMPORT_TARGET_BATCH_SECONDS"] = float(os.environ.get("IMPORT_TARGET_BATCH_SECONDS", 10.0))
+app.config["IMPORT_MAX_BATCH_BYTES"] = int(os.environ.get("IMPORT_MAX_BATCH_BYTES", 8 * 1024 * 1024))
+app.config["IMPORT_MIN_BATCH_SIZE"] = int(os.environ.get("IMPORT_MIN_BATCH_SIZE", 10))
+app.config["IMPORT_MAX_BATCH_SIZE"] = int(os.environ.get("IMPORT_MAX_BATCH_SIZE", 200))
+# Per-job series kept by /api/metrics; connections always keep theirs
+app.config["METRICS_MAX_JOBS"] = int(os.environ.get("METRICS_MAX_JOBS", 50))
+# Fraction of insert_many payloads logged at DEBUG level, for troubleshooting only
+app.config["IMPORT_DEBUG_PAYLOAD_SAMPLE"] = float(os.environ.get("IMPORT_DEBUG_PAYLOAD_SAMPLE", 0))
+# Progress of jobs running in another process is read from the database at most this often
+app.config["PROGRESS_CACHE_TTL"] = float(os.environ.get("PROGRESS_CACHE_TTL", 2.0))
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}")
+    cursor.execute(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.close()
+
 
 db.init_app(app)
 
@@ -47,4 +120,31 @@ from flask import render_template
 
 with app.app_context():
     import models
-    db.create_all()
+
+
+def init_db():
+    """Create the tables of a new database, stamped with the latest migration.
+
+    An existing database is left alone; `flask db upgrade` migrates it.
+    """
+    with app.app_context():
+        if db.inspect(db.engine).has_table('import_job'):
+            return
+        db.create_all()
+        script = ScriptDirectory.from_config(migrate.get_config())
+        with db.engine.begin() as connection:
+            MigrationContext.configure(connection).stamp(script, 'head')
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the tables of a new database."""
+    init_db()
+
+
+@app.before_request
+def recover_import_queue():
+    # Not at import time: `flask db upgrade` imports the app too, and the
+    # queries need the migrated schema
+    from import_engine.executor import recover_queued_jobs_once
+    recover_queued_jobs_once()
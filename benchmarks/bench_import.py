@@ -0,0 +1,210 @@
+"""End-to-end import throughput against a local mock Frappe site.
+
+    python benchmarks/bench_import.py [--rows 100000] [--format csv|xlsx] [--child-tables]
+                                      [--latency 0.005] [--per-row-latency 0.0001]
+                                      [--failure-rate 0] [--error-rate 0] [--rate-limit 0]
+    python benchmarks/bench_import.py --suite [--rows 10000,100000,1000000]
+
+Generates a Customer upload and drives the real /api/upload -> /api/import
+-> /api/status flow on a throwaway SQLite database, with the mock site
+(benchmarks/mock_frappe.py) in a process of its own. Reports upload and
+import rows/sec, p50/p99 insert_many latency as seen by the site, the time
+per pipeline stage from /api/metrics and the importer's peak RSS. --suite
+runs every combination of the given row counts, CSV/XLSX and with/without
+child tables, each in a fresh process so peak RSS is per scenario. App
+settings come from the environment as usual, e.g.
+
+    IMPORT_ADAPTIVE_BATCHING=0 python benchmarks/bench_import.py --rows 50000
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULT_PREFIX = "RESULT "
+STATUS_POLL_INTERVAL = 0.2
+
+
+def make_upload(rows, file_format, child_tables):
+    header = ["customer_name [Data]", "customer_group [Link] [Customer Group]",
+              "customer_type [Select] [Company, Individual]"]
+    if child_tables:
+        header += ["credit_limits.1.company [Link] [Company]", "credit_limits.1.credit_limit [Currency]",
+                   "credit_limits.2.company [Link] [Company]", "credit_limits.2.credit_limit [Currency]"]
+
+    def row(i):
+        values = [f"Customer {i}", f"Group {i % 10}", "Company" if i % 2 else "Individual"]
+        if child_tables:
+            # Every other customer has a second credit limit
+            values += [f"Company {i % 3}", 1000 + i, f"Company {(i + 1) % 3}" if i % 2 else None, 500 if i % 2 else None]
+        return values
+
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(row(i) for i in range(rows))
+        return buffer.getvalue().encode()
+
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for i in range(rows):
+        sheet.append(row(i))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def start_mock(args):
+    command = [
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_frappe.py'),
+        '--latency', str(args.latency), '--per-row-latency', str(args.per_row_latency),
+        '--failure-rate', str(args.failure_rate), '--error-rate', str(args.error_rate),
+        '--rate-limit', str(args.rate_limit),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return process, process.stdout.readline().strip()
+
+
+def stage_seconds(metrics_text, job_id):
+    pattern = re.compile(rf'frappe_import_job_stage_seconds_sum{{stage="([^"]+)",job="{job_id}"}} ([0-9.]+)')
+    return {stage: round(float(seconds), 2) for stage, seconds in pattern.findall(metrics_text)}
+
+
+def run_scenario(args):
+    workdir = tempfile.mkdtemp(prefix="bench_import_")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.chdir(workdir)
+    os.makedirs("uploads", exist_ok=True)
+
+    data = make_upload(args.rows, args.format, args.child_tables)
+    mock, url = start_mock(args)
+    try:
+        from app import app, db
+        from models import FrappeConnection
+        from import_engine.metrics import peak_rss_mb
+        logging.getLogger().setLevel(logging.WARNING)
+
+        with app.app_context():
+            conn = FrappeConnection(url=url, username="bench", password_hash="-", api_key="k", api_secret="s")
+            db.session.add(conn)
+            db.session.commit()
+            conn_id = conn.id
+
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/api/upload', data={
+            'connection_id': str(conn_id),
+            'doctype': 'Customer',
+            'file': (io.BytesIO(data), f'bench.{args.format}'),
+        }, content_type='multipart/form-data')
+        upload_seconds = time.perf_counter() - started
+        if response.status_code != 200:
+            raise SystemExit(f"Upload failed: {response.json}")
+        job_id = response.json['job_id']
+
+        started = time.perf_counter()
+        client.post(f'/api/import/{job_id}/{conn_id}', json={'isolate_errors': bool(args.failure_rate)})
+        while True:
+            status = client.get(f'/api/status/{job_id}').json
+            if status['status'] in ('completed', 'failed', 'cancelled'):
+                break
+            time.sleep(STATUS_POLL_INTERVAL)
+        import_seconds = time.perf_counter() - started
+
+        site = requests.get(f"{url}/__bench/stats").json()
+        latencies = np.array(site['insert_many_latencies']) * 1000
+        return {
+            "scenario": f"{args.rows} rows {args.format}{' +child tables' if args.child_tables else ''}",
+            "status": status['status'],
+            "error": status.get('error_message'),
+            "upload_rows_per_sec": round(args.rows / upload_seconds),
+            "import_rows_per_sec": round(args.rows / import_seconds),
+            "failed_rows": status.get('failed_rows'),
+            "insert_many_calls": len(latencies),
+            "batch_p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+            "batch_p99_ms": round(float(np.percentile(latencies, 99)), 1) if len(latencies) else None,
+            "stage_seconds": stage_seconds(client.get('/api/metrics').data.decode(), job_id),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+def print_result(result):
+    print(f"{result['scenario']}: {result['status']}" + (f" ({result['error']})" if result['error'] else ""))
+    print(f"  upload  {result['upload_rows_per_sec']:>10,} rows/sec")
+    print(f"  import  {result['import_rows_per_sec']:>10,} rows/sec  "
+          f"{result['insert_many_calls']} insert_many, p50 {result['batch_p50_ms']} ms, p99 {result['batch_p99_ms']} ms"
+          + (f", {result['failed_rows']} rows rejected" if result['failed_rows'] else ""))
+    print(f"  stages  {', '.join(f'{stage} {seconds}s' for stage, seconds in result['stage_seconds'].items())}")
+    print(f"  peak RSS {result['peak_rss_mb']} MB")
+
+
+def run_suite(args):
+    # Site options are passed through; the scenario options are set per run
+    passthrough = [
+        '--latency', str(args.latency), '--per-row-latency', str(args.per_row_latency),
+        '--failure-rate', str(args.failure_rate), '--error-rate', str(args.error_rate),
+        '--rate-limit', str(args.rate_limit),
+    ]
+    for rows in args.rows_list:
+        for file_format in ('csv', 'xlsx'):
+            for child_tables in (False, True):
+                command = [sys.executable, os.path.abspath(__file__), '--rows', str(rows),
+                           '--format', file_format, '--json'] + passthrough
+                if child_tables:
+                    command.append('--child-tables')
+                output = subprocess.run(command, capture_output=True, text=True).stdout
+                line = next((line for line in output.splitlines() if line.startswith(RESULT_PREFIX)), None)
+                if line is None:
+                    print(f"{rows} rows {file_format}: no result\n{output}")
+                    continue
+                print_result(json.loads(line[len(RESULT_PREFIX):]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', help="row count, or a comma separated list with --suite "
+                                        "(default 100000, or 10000,100000 for --suite)")
+    parser.add_argument('--format', choices=('csv', 'xlsx'), default='csv')
+    parser.add_argument('--child-tables', action='store_true')
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--per-row-latency', type=float, default=0.0001)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=0)
+    parser.add_argument('--suite', action='store_true', help="run all formats with and without child tables")
+    parser.add_argument('--json', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.rows_list = [int(rows) for rows in (args.rows or ('10000,100000' if args.suite else '100000')).split(',')]
+
+    if args.suite:
+        return run_suite(args)
+
+    args.rows = args.rows_list[0]
+    result = run_scenario(args)
+    if args.json:
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+    else:
+        print_result(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Micro-benchmark: legacy iterrows row mapping vs the compiled MappingPlan.
+
+    python benchmarks/bench_mapping_plan.py [rows] [child_rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ImporterMethods.Customer import get_field_mapping
+from import_engine.mapping_plan import MappingPlan
+
+
+def make_batch(rows, child_rows):
+    rng = np.random.default_rng(0)
+    data = {
+        "customer_name [Data]": [f"Customer {i}" for i in range(rows)],
+        "customer_type [Select [Company, Individual]]": rng.choice(["Company", "Individual"], rows),
+        "customer_group [Link [Customer Group]]": rng.choice(["Commercial", "Retail", None], rows),
+        "credit_limit [Currency]": rng.random(rows) * 1000,
+        "payment_days [Int]": np.where(rng.random(rows) < 0.2, np.nan, rng.integers(0, 90, rows)),
+    }
+    for row_num in range(1, child_rows + 1):
+        filled = rng.random(rows) < 1 / row_num
+        data[f"items.{row_num}.item_code [Link [Item]]"] = np.where(filled, f"ITEM-{row_num}", None)
+        data[f"items.{row_num}.qty [Float]"] = np.where(filled, rng.random(rows) * 10, np.nan)
+    return pd.DataFrame(data)
+
+
+def legacy_map_batch(batch_df, doctype):
+    """The row mapping loop import_data used before the mapping plan."""
+    mapped_data = []
+    for _, row in batch_df.iterrows():
+        record = {}
+        child_tables = {}
+
+        for excel_col in row.index:
+            fieldname, fieldtype, options = get_field_mapping(excel_col)
+
+            if '.' in fieldname:
+                parts = fieldname.split('.')
+                if len(parts) == 3:
+                    table_name, row_num, field_name = parts
+                    row_num = int(row_num)
+
+                    if table_name not in child_tables:
+                        child_tables[table_name] = {}
+
+                    if row_num not in child_tables[table_name]:
+                        child_tables[table_name][row_num] = {}
+
+                    if pd.notna(row[excel_col]) and str(row[excel_col]).strip():
+                        child_tables[table_name][row_num][field_name] = row[excel_col]
+            else:
+                if pd.notna(row[excel_col]):
+                    record[fieldname] = row[excel_col]
+
+        for table_name, rows in child_tables.items():
+            valid_rows = [data for row_num, data in sorted(rows.items()) if data]
+            if valid_rows:
+                record[table_name] = valid_rows
+
+        if record:
+            mapped_data.append(record)
+    return [{"doctype": doctype, **record} for record in mapped_data]
+
+
+def measure(label, func, batch_df, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        docs = func(batch_df)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<12} {len(batch_df) / best:>12,.0f} rows/sec  ({best * 1000:.1f} ms)")
+    return docs
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    child_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    batch_df = make_batch(rows, child_rows)
+    print(f"{rows} rows x {len(batch_df.columns)} columns ({child_rows} child rows)")
+
+    legacy = measure("iterrows", lambda df: legacy_map_batch(df, "Customer"), batch_df)
+    plan = MappingPlan.compile(batch_df.columns.tolist())
+    planned = measure("plan", lambda df: plan.to_docs(df, "Customer"), batch_df)
+    assert len(legacy) == len(planned)
+
+
+if __name__ == "__main__":
+    main()
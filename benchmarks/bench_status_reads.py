@@ -0,0 +1,134 @@
+"""Status-read latency while several imports write to the job store.
+
+    python benchmarks/bench_status_reads.py [jobs] [rows_per_job]
+
+Runs the imports against a local mock Frappe site on a throwaway SQLite
+database, while reader threads hit /api/status and read the ImportJob row
+directly. Compare settings through the app's environment variables, e.g.
+
+    SQLITE_JOURNAL_MODE=DELETE JOB_FLUSH_EVERY_BATCHES=1 python benchmarks/bench_status_reads.py
+"""
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_status_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.environ.setdefault("IMPORT_TARGET_BATCH_SECONDS", "0.05")
+os.environ.setdefault("IMPORT_MAX_INFLIGHT_PER_CONNECTION", "32")
+
+from mock_frappe import MockFrappe  # noqa: E402
+
+READERS = 4
+# Pause between polling rounds of one reader, roughly a busy dashboard
+READ_INTERVAL = 0.01
+
+
+def make_csv(rows):
+    lines = ["customer_name [Data],customer_group [Link] [Customer Group]"]
+    lines += [f"Customer {i},Group {i % 10}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def percentiles(samples):
+    if not samples:
+        return "no samples"
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):6.2f} ms  p99 {np.percentile(ms, 99):6.2f} ms  max {ms.max():7.2f} ms"
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    os.chdir(WORKDIR)
+    os.makedirs("uploads", exist_ok=True)
+    frappe = MockFrappe(latency=0.005, per_row_latency=0.0001).start()
+
+    from app import app, db
+    from models import FrappeConnection, ImportJob
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{jobs} jobs x {rows} rows, journal_mode={app.config['SQLITE_JOURNAL_MODE']}, "
+          f"flush every {app.config['JOB_FLUSH_EVERY_BATCHES']} batches / {app.config['JOB_FLUSH_INTERVAL_MS']} ms")
+
+    with app.app_context():
+        conn = FrappeConnection(url=frappe.url, username="bench", password_hash="-", api_key="k", api_secret="s")
+        db.session.add(conn)
+        db.session.commit()
+        conn_id = conn.id
+
+    client = app.test_client()
+    job_ids = []
+    for n in range(jobs):
+        response = client.post('/api/upload', data={
+            'connection_id': str(conn_id),
+            'doctype': 'Customer',
+            'file': (io.BytesIO(make_csv(rows)), f'bench_{n}.csv'),
+        }, content_type='multipart/form-data')
+        job_ids.append(response.json['job_id'])
+
+    api_latencies, db_latencies = [], []
+    done = threading.Event()
+
+    def api_reader():
+        reader = app.test_client()
+        while not done.is_set():
+            for job_id in job_ids:
+                start = time.perf_counter()
+                reader.get(f'/api/status/{job_id}')
+                api_latencies.append(time.perf_counter() - start)
+            time.sleep(READ_INTERVAL)
+
+    def db_reader():
+        with app.app_context():
+            while not done.is_set():
+                for job_id in job_ids:
+                    start = time.perf_counter()
+                    db.session.get(ImportJob, job_id)
+                    db.session.rollback()
+                    db.session.expire_all()
+                    db_latencies.append(time.perf_counter() - start)
+                time.sleep(READ_INTERVAL)
+
+    readers = [threading.Thread(target=api_reader) for _ in range(READERS // 2)]
+    readers += [threading.Thread(target=db_reader) for _ in range(READERS - READERS // 2)]
+
+    started = time.perf_counter()
+    for job_id in job_ids:
+        client.post(f'/api/import/{job_id}/{conn_id}', json={})
+    for reader in readers:
+        reader.start()
+
+    while True:
+        with app.app_context():
+            finished = db.session.query(ImportJob.status, ImportJob.error_message).filter(ImportJob.id.in_(job_ids)).all()
+        if all(status in ('completed', 'failed') for status, _ in finished):
+            break
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - started
+    done.set()
+    for reader in readers:
+        reader.join()
+    frappe.stop()
+
+    failed = [error for status, error in finished if status == 'failed']
+    print(f"imports      {jobs * rows / elapsed:>10,.0f} rows/sec  ({elapsed:.1f} s, {len(failed)} failed)")
+    for error in set(failed):
+        print(f"  {error}")
+    print(f"/api/status  {len(api_latencies):>8} reads  {percentiles(api_latencies)}")
+    print(f"ImportJob    {len(db_latencies):>8} reads  {percentiles(db_latencies)}")
+
+
+if __name__ == "__main__":
+    main()
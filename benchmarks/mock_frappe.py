@@ -0,0 +1,316 @@
+"""Minimal stand-in for a Frappe site, for benchmarks.
+
+Answers the endpoints an import touches: getdoctype, validate_link,
+get_list, insert and insert_many. Writes sleep latency + per_row_latency *
+len(docs) to mimic the site's cost per document. Optionally:
+
+    failure_rate  fraction of docs insert_many rejects with a ValidationError
+                  (decided per doc content, so a resent doc fails again)
+    error_rate    fraction of write requests answered 503 (transient)
+    lost_rate     fraction of insert_many requests answered 502 after the
+                  docs were inserted, like a gateway timing out
+    rate_limit    requests per second above which requests get 429
+
+Inserted Customer and Address docs are kept, so get_list filters them
+("=", "in", "is set"/"is not set") and returns the requested fields the way
+a site does: dedupe, name matching and resumed imports see what was
+inserted. Docs without a name are named from a series ("CUST-1", ...), a
+name that exists already is a DuplicateEntryError, and insert_many returns
+the names in no particular order, as Frappe collects them in a set. Link
+lookups on any other doctype always resolve. GET /__bench/stats reports
+what was inserted and the insert_many latencies, POST /__bench/reset
+clears them. Run standalone, in a process of its own, with
+
+    python benchmarks/mock_frappe.py --port 8123 --latency 0.005
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CUSTOMER_META = {
+    "docs": [{
+        "name": "Customer",
+        "modified": "2025-01-01 00:00:00",
+        "autoname": "",
+        "fields": [
+            {"fieldname": "customer_name", "fieldtype": "Data"},
+            {"fieldname": "customer_group", "fieldtype": "Link", "options": "Customer Group"},
+            {"fieldname": "customer_type", "fieldtype": "Select", "options": "Company\nIndividual"},
+            {"fieldname": "credit_limits", "fieldtype": "Table", "options": "Customer Credit Limit"},
+        ],
+    }, {
+        "name": "Customer Credit Limit",
+        "modified": "2025-01-01 00:00:00",
+        "istable": 1,
+        "fields": [
+            {"fieldname": "company", "fieldtype": "Link", "options": "Company"},
+            {"fieldname": "credit_limit", "fieldtype": "Currency"},
+        ],
+    }]
+}
+
+
+# Doctypes whose inserted docs are kept and queried, with their naming series
+STORED_DOCTYPES = {"Customer": "CUST", "Address": "ADDR"}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections when many clients connect at once
+    request_queue_size = 1024
+
+
+class MockFrappe:
+
+    def __init__(self, latency=0.0, per_row_latency=0.0, failure_rate=0.0, error_rate=0.0, rate_limit=0, port=0,
+                 lost_rate=0.0):
+        self.latency = latency
+        self.per_row_latency = per_row_latency
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.lost_rate = lost_rate
+        self.inserted = 0
+        self.rejected = 0
+        # doctype -> {name: doc}
+        self.records = {doctype: {} for doctype in STORED_DOCTYPES}
+        self.requests = {}
+        self.latencies = []
+        self._lock = threading.Lock()
+        # One-second window of the rate limiter
+        self._window = (0, 0)
+        self._server = _Server(('127.0.0.1', port), self._handler())
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "inserted": self.inserted,
+                "rejected": self.rejected,
+                "requests": dict(self.requests),
+                "insert_many_latencies": list(self.latencies),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.inserted = self.rejected = 0
+            self.records = {doctype: {} for doctype in STORED_DOCTYPES}
+            self.requests = {}
+            self.latencies = []
+
+    def _count(self, method):
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def _rate_limited(self):
+        if not self.rate_limit:
+            return False
+        second = int(time.monotonic())
+        with self._lock:
+            start, count = self._window
+            if start != second:
+                start, count = second, 0
+            self._window = (start, count + 1)
+            return count >= self.rate_limit
+
+    def docs(self, doctype):
+        """Inserted docs of doctype, with their names."""
+        with self._lock:
+            return list(self.records.get(doctype, {}).values())
+
+    def _store(self, docs):
+        """Name and keep docs, all or none; returns their names, or the duplicate name."""
+        with self._lock:
+            named = []
+            taken = set()
+            for doc in docs:
+                records = self.records.get(doc.get("doctype"))
+                name = doc.get("name")
+                if name is None:
+                    prefix = STORED_DOCTYPES.get(doc.get("doctype"), "DOC")
+                    name = f"{prefix}-{self.inserted + len(named) + 1}"
+                elif (records is not None and name in records) or name in taken:
+                    return None, name
+                taken.add(name)
+                named.append((records, {**doc, "name": name}))
+            for records, doc in named:
+                if records is not None:
+                    records[doc["name"]] = doc
+            self.inserted += len(named)
+            return [doc["name"] for _, doc in named], None
+
+    def _get_list(self, doctype, filters, fields):
+        with self._lock:
+            records = self.records.get(doctype)
+            if records is None:
+                # Link lookups: every referenced name exists
+                names = next((f[-1] for f in filters if f[-2] == 'in' and f[-3] == 'name'), [])
+                return [{"name": name} for name in names]
+            rows = [doc for doc in records.values() if all(_matches(doc, f) for f in filters)]
+        if fields == ["*"]:
+            return rows
+        return [{field: doc.get(field) for field in fields} for doc in rows]
+
+    def _rejects(self, doc):
+        if not self.failure_rate:
+            return False
+        checksum = zlib.crc32(json.dumps(doc, sort_keys=True).encode())
+        return checksum % 10000 < self.failure_rate * 10000
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; with Nagle's algorithm
+            # the body waits for the client's delayed ACK, ~40 ms per request
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _method(self, url):
+                return url.path.rsplit('/', 1)[-1]
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/__bench/stats':
+                    return self._send(200, mock.stats())
+
+                method = self._method(url)
+                mock._count(method)
+                if mock._rate_limited():
+                    return self._send(429, {"exc_type": "TooManyRequestsError"}, {'Retry-After': '1'})
+                if method == 'frappe.desk.form.load.getdoctype':
+                    return self._send(200, CUSTOMER_META)
+                if method == 'frappe.client.validate_link':
+                    return self._send(200, {"message": {"name": query.get('docname', [''])[0]}})
+                if method == 'frappe.client.get_list':
+                    filters = json.loads(query.get('filters', ['[]'])[0])
+                    if isinstance(filters, dict):
+                        filters = [[field, '=', value] for field, value in filters.items()]
+                    fields = json.loads(query.get('fields', ['["name"]'])[0])
+                    return self._send(200, {"message": mock._get_list(query['doctype'][0], filters, fields)})
+                return self._send(200, {"message": {}})
+
+            def do_POST(self):
+                started = time.monotonic()
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                if self.path == '/__bench/reset':
+                    mock.reset()
+                    return self._send(200, {"message": "ok"})
+
+                method = self._method(urlparse(self.path))
+                mock._count(method)
+                if mock._rate_limited():
+                    return self._send(429, {"exc_type": "TooManyRequestsError"}, {'Retry-After': '1'})
+                if mock.error_rate and random.random() < mock.error_rate:
+                    return self._send(503, {"exc_type": "ServiceUnavailable"})
+
+                if method == 'frappe.client.insert_many':
+                    docs = json.loads(body)["docs"]
+                    time.sleep(mock.latency + mock.per_row_latency * len(docs))
+                    rejected = next((doc for doc in docs if mock._rejects(doc)), None)
+                    names, duplicate = (None, None) if rejected is not None else mock._store(docs)
+                    with mock._lock:
+                        mock.latencies.append(time.monotonic() - started)
+                        if names is None:
+                            # insert_many rolls back the whole request
+                            mock.rejected += 1
+                    if rejected is not None:
+                        return self._send(417, {
+                            "exc_type": "ValidationError",
+                            "exception": f"frappe.exceptions.ValidationError: Rejected {rejected.get('customer_name')}",
+                        })
+                    if duplicate is not None:
+                        return self._send(409, {
+                            "exc_type": "DuplicateEntryError",
+                            "exception": f"frappe.exceptions.DuplicateEntryError: {duplicate}",
+                        })
+                    if mock.lost_rate and random.random() < mock.lost_rate:
+                        return self._send(502, {"exc_type": "BadGateway"})
+                    # Frappe collects the names in a set
+                    return self._send(200, {"message": list(set(names))})
+
+                if method == 'frappe.client.insert':
+                    doc = json.loads(body)["doc"]
+                    time.sleep(mock.latency + mock.per_row_latency)
+                    if mock._rejects(doc):
+                        return self._send(417, {"exc_type": "ValidationError", "exception": "Rejected"})
+                    names, duplicate = mock._store([doc])
+                    if duplicate is not None:
+                        return self._send(409, {"exc_type": "DuplicateEntryError", "exception": duplicate})
+                    return self._send(200, {"message": {**doc, "name": names[0]}})
+                return self._send(200, {"message": {}})
+
+        return Handler
+
+
+def _matches(doc, condition):
+    # [field, op, value] or [doctype, field, op, value]
+    field, op, value = condition[-3:]
+    actual = doc.get(field)
+    if op == '=':
+        return str(actual) == str(value)
+    if op == 'in':
+        return str(actual) in {str(item) for item in value}
+    if op == 'is':
+        return (actual not in (None, '')) == (value == 'set')
+    raise ValueError(f"Unsupported filter operator {op!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--per-row-latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=0)
+    parser.add_argument('--lost-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock = MockFrappe(args.latency, args.per_row_latency, args.failure_rate, args.error_rate, args.rate_limit, args.port,
+                      args.lost_rate)
+    mock.start()
+    # The parent process reads the URL from the first line
+    print(mock.url, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
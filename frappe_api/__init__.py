@@ -0,0 +1,3 @@
+from .client import FrappeClient, get_client, drop_client
+from .payload import Payload, dumps, encode_insert_many
+from .async_client import AsyncFrappeClient, RedirectError, get_async_client, drop_async_client, io_loop
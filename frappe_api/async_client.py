@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import certifi
+import httpx
+import requests
+from app import app
+from .client import RETRY_STATUSES
+from .payload import Payload, dumps, encode_insert_many
+
+# asyncio transport for Frappe calls. All connections share one event loop
+# running on a background thread (io_loop), so any number of outstanding
+# requests, across jobs and sites, cost a coroutine each instead of a thread.
+# Callers on ordinary threads hand coroutines over with io_loop.submit() or
+# io_loop.run(). HTTP is httpx's AsyncClient, one per site, which keeps
+# connections alive and holds at most FRAPPE_ASYNC_MAX_CONNECTIONS of them;
+# the rest of the requests wait their turn.
+# Responses look like requests.Response (status_code, ok, headers, text,
+# json()) and network failures raise requests.ConnectionError/Timeout, so
+# code handling either transport reads the same.
+# As with requests, HTTPS is verified against certifi's CA bundle (or
+# REQUESTS_CA_BUNDLE) and the HTTP(S)_PROXY/NO_PROXY environment variables
+# apply. Redirects are not followed: a Frappe API call that is redirected
+# means the connection URL is wrong, so it raises RedirectError.
+# insert_many bodies are encoded on FRAPPE_ENCODE_THREADS threads of their
+# own, so a large batch doesn't hold up the loop and blocking work in the
+# default executor can't hold up the encoding.
+
+# httpx logs every request at INFO and httpcore every step at DEBUG
+logging.getLogger('httpx').setLevel(logging.WARNING)
+logging.getLogger('httpcore').setLevel(logging.WARNING)
+
+
+class RedirectError(requests.RequestException):
+    pass
+
+
+class Response:
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncFrappeClient:
+    """asyncio HTTP client for one Frappe site; use from coroutines on io_loop.
+
+    Mirrors FrappeClient: GET calls are retried with jittered exponential
+    backoff, POSTs are not retried by default.
+    """
+
+    def __init__(self, url, api_key=None, api_secret=None, max_connections=None):
+        self.url = url.rstrip('/')
+        self.headers = {
+            'User-Agent': f"python-requests/{requests.__version__}",
+            'Accept': '*/*',
+        }
+        if api_key and api_secret:
+            self.headers['Authorization'] = f'token {api_key}:{api_secret}'
+        self.connect_timeout = app.config["FRAPPE_CONNECT_TIMEOUT"]
+        self.read_timeout = app.config["FRAPPE_READ_TIMEOUT"]
+        self.max_connections = max_connections or app.config["FRAPPE_ASYNC_MAX_CONNECTIONS"]
+        # Created on the loop on first use
+        self._client = None
+
+    async def request(self, method, path, retries=None, params=None, json=None, data=None, headers=None):
+        if retries is None:
+            retries = app.config["FRAPPE_HTTP_RETRIES"] if method == 'GET' else 0
+        headers = dict(headers or {})
+        if json is not None:
+            data = dumps(json)
+            headers.setdefault('Content-Type', 'application/json')
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(method, path, params, data, headers)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+            else:
+                if 300 <= response.status_code < 400 and response.status_code != 304:
+                    raise RedirectError(
+                        f"{method} {path} was redirected ({response.status_code}) to "
+                        f"{response.headers.get('Location')!r}; set the connection URL to the site's address",
+                        response=response)
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+            delay = min(app.config["FRAPPE_RETRY_BACKOFF_MAX"], 0.5 * 2 ** attempt) * (0.5 + random.random())
+            logging.warning(f"Retrying {method} {path} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def get_doctype(self, doctype):
+        return await self.get(
+            "/api/method/frappe.desk.form.load.getdoctype",
+            params={"doctype": doctype, "with_parent": 1}
+        )
+
+    async def validate_link(self, doctype, docname):
+        return await self.get(
+            "/api/method/frappe.client.validate_link",
+            params={"doctype": doctype, "docname": docname}
+        )
+
+    async def get_list(self, doctype, filters=None, fields=None, limit_page_length=0):
+        return await self.get(
+            "/api/method/frappe.client.get_list",
+            params={
+                "doctype": doctype,
+                "filters": dumps(filters or []).decode(),
+                "fields": dumps(fields or ["name"]).decode(),
+                "limit_page_length": limit_page_length
+            }
+        )
+
+    async def insert(self, doc, **kwargs):
+        return await self.post("/api/method/frappe.client.insert", json={"doc": doc}, **kwargs)
+
+    async def insert_many(self, docs, **kwargs):
+        return await self.post_insert_many(*await self.encode_insert_many(docs), **kwargs)
+
+    async def encode_insert_many(self, docs):
+        """encode_insert_many on an encoding thread rather than the loop."""
+        return await asyncio.get_running_loop().run_in_executor(_encoder_pool(), encode_insert_many, docs)
+
+    async def post_insert_many(self, body, headers, **kwargs):
+        """insert_many with a body already built by encode_insert_many."""
+        return await self.post("/api/method/frappe.client.insert_many", data=body, headers=headers, **kwargs)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _send(self, method, path, params, body, headers):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers=self.headers,
+                verify=ssl.create_default_context(cafile=_ca_bundle()),
+                # Waiting for one of the site's connections isn't a timeout
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout, pool=None),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        if isinstance(body, Payload):
+            # Sent chunk by chunk, with the Content-Length known up front
+            headers['Content-Length'] = str(len(body))
+            body = _stream(body)
+        try:
+            response = await self._client.request(method, path, params=params, content=body, headers=headers)
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(f"Connecting to {self.url} timed out after {self.connect_timeout}s: {e!r}")
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(f"Read timed out after {self.read_timeout}s: {method} {path}: {e!r}")
+        except httpx.ProxyError as e:
+            raise requests.exceptions.ProxyError(f"{method} {path} via proxy: {e!r}")
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(f"{method} {path}: {e!r}")
+        return Response(response.status_code, response.headers, response.content)
+
+
+async def _stream(payload):
+    for chunk in payload:
+        yield chunk
+
+
+def _ca_bundle():
+    # requests' own override, else the CA bundle requests ships with
+    return os.environ.get('REQUESTS_CA_BUNDLE') or os.environ.get('CURL_CA_BUNDLE') or certifi.where()
+
+
+_encoders = None
+_encoders_lock = threading.Lock()
+
+
+def _encoder_pool():
+    global _encoders
+    with _encoders_lock:
+        if _encoders is None:
+            _encoders = ThreadPoolExecutor(
+                max_workers=app.config["FRAPPE_ENCODE_THREADS"], thread_name_prefix="frappe-encode")
+        return _encoders
+
+
+class EventLoopThread:
+    """The event loop the async transport runs on, started on first use."""
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="frappe-io", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """Run a coroutine on the loop and wait for its result; not for use on the loop itself."""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("io_loop.run() called from the event loop; await the coroutine instead")
+        return self.submit(coro).result()
+
+
+io_loop = EventLoopThread()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_async_client(conn):
+    """Shared AsyncFrappeClient for a FrappeConnection, rebuilt if its URL or keys change."""
+    signature = (conn.url, conn.api_key, conn.api_secret)
+    with _clients_lock:
+        cached = _clients.get(conn.id)
+        if cached and cached[0] == signature:
+            return cached[1]
+        # As with get_client, a replaced client is left to finish its requests
+        client = AsyncFrappeClient(conn.url, conn.api_key, conn.api_secret)
+        _clients[conn.id] = (signature, client)
+        return client
+
+
+def drop_async_client(connection_id):
+    with _clients_lock:
+        cached = _clients.pop(connection_id, None)
+    if cached:
+        io_loop.submit(cached[1].close())
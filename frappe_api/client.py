@@ -0,0 +1,114 @@
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from app import app
+from .payload import encode_insert_many
+
+# Statuses worth retrying for idempotent calls
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FrappeClient:
+    """HTTP client for one Frappe site on top of a pooled requests.Session.
+
+    Connections are kept alive and reused across requests and threads. GET
+    calls are retried with jittered exponential backoff; POSTs are not
+    retried by default because Frappe inserts are not idempotent.
+    """
+
+    def __init__(self, url, api_key=None, api_secret=None):
+        self.url = url.rstrip('/')
+        self.timeout = (app.config["FRAPPE_CONNECT_TIMEOUT"], app.config["FRAPPE_READ_TIMEOUT"])
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=app.config["FRAPPE_POOL_SIZE"])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key and api_secret:
+            self.session.headers['Authorization'] = f'token {api_key}:{api_secret}'
+
+    def request(self, method, path, retries=None, **kwargs):
+        if retries is None:
+            retries = app.config["FRAPPE_HTTP_RETRIES"] if method == 'GET' else 0
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, f"{self.url}{path}", **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+            delay = min(app.config["FRAPPE_RETRY_BACKOFF_MAX"], 0.5 * 2 ** attempt) * (0.5 + random.random())
+            logging.warning(f"Retrying {method} {path} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def get_doctype(self, doctype):
+        return self.get(
+            "/api/method/frappe.desk.form.load.getdoctype",
+            params={"doctype": doctype, "with_parent": 1}
+        )
+
+    def validate_link(self, doctype, docname):
+        return self.get(
+            "/api/method/frappe.client.validate_link",
+            params={"doctype": doctype, "docname": docname}
+        )
+
+    def get_list(self, doctype, filters=None, fields=None, limit_page_length=0):
+        return self.get(
+            "/api/method/frappe.client.get_list",
+            params={
+                "doctype": doctype,
+                "filters": json.dumps(filters or []),
+                "fields": json.dumps(fields or ["name"]),
+                "limit_page_length": limit_page_length
+            }
+        )
+
+    def insert(self, doc, **kwargs):
+        return self.post("/api/method/frappe.client.insert", json={"doc": doc}, **kwargs)
+
+    def insert_many(self, docs, **kwargs):
+        return self.post_insert_many(*encode_insert_many(docs), **kwargs)
+
+    def post_insert_many(self, body, headers, **kwargs):
+        """insert_many with a body already built by encode_insert_many."""
+        return self.post("/api/method/frappe.client.insert_many", data=body, headers=headers, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(conn):
+    """Shared client for a FrappeConnection, rebuilt if its URL or keys change."""
+    signature = (conn.url, conn.api_key, conn.api_secret)
+    with _clients_lock:
+        cached = _clients.get(conn.id)
+        if cached and cached[0] == signature:
+            return cached[1]
+        # A replaced client is left to the garbage collector rather than
+        # closed, other threads may still have requests in flight on it
+        client = FrappeClient(conn.url, conn.api_key, conn.api_secret)
+        _clients[conn.id] = (signature, client)
+        return client
+
+
+def drop_client(connection_id):
+    with _clients_lock:
+        _clients.pop(connection_id, None)
@@ -0,0 +1,116 @@
+import datetime
+import decimal
+import json
+import zlib
+
+import numpy as np
+from app import app
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+# insert_many bodies are encoded a few docs at a time into a Payload: a list of byte
+# chunks that requests and the async client send one after the other, with
+# the Content-Length known up front. Once the body reaches
+# FRAPPE_GZIP_MIN_BYTES, every further chunk goes straight into the
+# compressor, so a batch is held once, compressed, instead of as a str, its
+# bytes and their gzip copy at the same time.
+# Docs built by MappingPlan already hold JSON-native values (see
+# mapping_plan._coerce); numpy/pandas scalars or dates that reach the
+# encoder from elsewhere are converted by _json_default rather than failing
+# the request. orjson is used when installed.
+
+GZIP_LEVEL = 5
+# Docs encoded per call; large enough that the per-call overhead of the
+# stdlib encoder doesn't show, small enough to stay well below the body size
+DOCS_PER_CHUNK = 50
+
+
+class Payload:
+    """Request body as a sequence of byte chunks; len() is its size in bytes."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = sum(len(chunk) for chunk in chunks)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def __len__(self):
+        return self.size
+
+    def __bytes__(self):
+        return b"".join(self.chunks)
+
+
+def encode_insert_many(docs):
+    """Request body (a Payload) and headers insert_many sends for docs."""
+    body = _BodyWriter(app.config["FRAPPE_GZIP_MIN_BYTES"])
+    body.write(b'{"docs":[')
+    for start in range(0, len(docs), DOCS_PER_CHUNK):
+        if start:
+            body.write(b',')
+        # Without the list's brackets
+        body.write(dumps(docs[start:start + DOCS_PER_CHUNK])[1:-1])
+    body.write(b']}')
+    return body.close()
+
+
+class _BodyWriter:
+
+    def __init__(self, gzip_min_bytes):
+        self.gzip_min_bytes = gzip_min_bytes
+        self.chunks = []
+        self.size = 0
+        self.compressor = None
+
+    def write(self, data):
+        if self.compressor:
+            data = self.compressor.compress(data)
+            if data:
+                self.chunks.append(data)
+            return
+
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.gzip_min_bytes and self.size >= self.gzip_min_bytes:
+            # wbits 31: gzip container, as gzip.compress writes
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            pending, self.chunks = self.chunks, []
+            for chunk in pending:
+                self.write(chunk)
+
+    def close(self):
+        """The Payload and its headers."""
+        headers = {'Content-Type': 'application/json'}
+        if self.compressor:
+            self.chunks.append(self.compressor.flush())
+            headers['Content-Encoding'] = 'gzip'
+        return Payload(self.chunks), headers
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_json_default)
+
+
+def dumps(value):
+    """Compact JSON bytes of value."""
+    if orjson is not None:
+        return orjson.dumps(
+            value, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME)
+    return _encoder.encode(value).encode()
@@ -0,0 +1,106 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from models import DocTypeSchema
+from .client import get_client
+
+# DocType meta is cached per (connection, doctype) in the local database so
+# the field picker, template generation and import-time type coercion don't
+# call getdoctype every time. A cached entry is trusted for
+# SCHEMA_CHECK_INTERVAL seconds. After that, one get_list on DocType compares
+# the `modified` timestamps of the doctype and its child tables. Custom Fields
+# and Property Setters don't touch DocType.modified, so entries are also
+# refetched once they are older than SCHEMA_MAX_AGE.
+
+
+class SchemaFetchError(Exception):
+    pass
+
+
+def flatten_fields(schema_data):
+    """Map field names (child fields as table.field) to their template type string."""
+    all_fields = {}
+    main_fields = schema_data['docs'][0]['fields']
+
+    for field in main_fields:
+        if field['fieldtype'] == 'Table':
+            child_doc = next((d for d in schema_data['docs'] if d['name'] == field['options']), None)
+            if child_doc and isinstance(child_doc, dict) and 'fields' in child_doc:
+                for child_field in child_doc['fields']:
+                    if isinstance(child_field, dict) and 'fieldname' in child_field:
+                        qualified_name = f"{field['fieldname']}.{child_field['fieldname']}"
+                        field_type = child_field.get('fieldtype', '')
+                        if field_type.endswith('Link'):
+                            field_type = f"{field_type} [{child_field.get('options', '')}]"
+                        all_fields[qualified_name] = field_type
+        elif isinstance(field, dict) and 'fieldname' in field:
+            field_type = field.get('fieldtype', '')
+            if field_type.endswith('Link'):
+                field_type = f"{field_type} [{field.get('options', '')}]"
+            elif field_type == 'Select':
+                options = field.get('options', '').replace('\n', ', ')
+                field_type = f"{field_type} [{options}]"
+            all_fields[field['fieldname']] = field_type
+    return all_fields
+
+
+def field_types(field_map):
+    """Base fieldtype per field, e.g. 'Link [Customer Group]' -> 'Link'."""
+    return {fieldname: field_type.split(' [')[0] for fieldname, field_type in field_map.items()}
+
+
+def get_doctype_schema(conn, doctype, refresh=False):
+    entry = DocTypeSchema.query.filter_by(connection_id=conn.id, doctype=doctype).first()
+    now = datetime.utcnow()
+
+    if entry and not refresh:
+        if now - entry.checked_at < timedelta(seconds=app.config["SCHEMA_CHECK_INTERVAL"]):
+            return entry
+        if now - entry.fetched_at < timedelta(seconds=app.config["SCHEMA_MAX_AGE"]):
+            current = _fetch_modified(conn, list(json.loads(entry.modified)))
+            if current is None or current == json.loads(entry.modified):
+                # Unchanged, or the check itself failed and the cached copy is the best we have
+                entry.checked_at = now
+                db.session.commit()
+                return entry
+
+    response = get_client(conn).get_doctype(doctype)
+    if not response.ok:
+        logging.error(f"Failed to fetch schema. Response: {response.text}")
+        raise SchemaFetchError(f"Unable to fetch schema for {doctype}")
+
+    schema_data = response.json()
+    if not entry:
+        entry = DocTypeSchema(connection_id=conn.id, doctype=doctype)
+        db.session.add(entry)
+    entry.meta = json.dumps(schema_data)
+    entry.field_map = json.dumps(flatten_fields(schema_data))
+    entry.modified = json.dumps(_modified_signature(schema_data))
+    entry.fetched_at = now
+    entry.checked_at = now
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another import worker cached the same doctype first
+        db.session.rollback()
+        entry = DocTypeSchema.query.filter_by(connection_id=conn.id, doctype=doctype).one()
+    return entry
+
+
+def _modified_signature(schema_data):
+    return {doc['name']: doc.get('modified') for doc in schema_data.get('docs', [])}
+
+
+def _fetch_modified(conn, names):
+    try:
+        response = get_client(conn).get_list(
+            "DocType", filters=[["name", "in", names]], fields=["name", "modified"])
+        if not response.ok:
+            return None
+        return {row['name']: row.get('modified') for row in response.json().get('message') or []}
+    except Exception as e:
+        logging.warning(f"Schema freshness check failed: {str(e)}")
+        return None
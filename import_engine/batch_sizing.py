@@ -0,0 +1,100 @@
+import threading
+
+from app import app
+
+# insert_many cost grows with the number of docs and their width (child
+# tables, long text), and what a site can absorb depends on its workers and
+# hooks, so no size picked from the upload alone fits every job. BatchSizer
+# starts from the upload heuristic and steers the size of the next batch
+# towards a target request latency, capped by payload size, backing off while
+# requests fail. Every change is recorded with the numbers that caused it.
+
+SMOOTHING = 0.3
+ERROR_RATE_THRESHOLD = 0.05
+# Ignore adjustments smaller than this, they are mostly noise
+MIN_CHANGE = 0.1
+HISTORY_LIMIT = 100
+
+
+class BatchSizer:
+
+    def __init__(self, initial, target_latency, max_bytes, min_size, max_size):
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = self._clamp(initial)
+        self.seconds_per_row = None
+        self.bytes_per_row = None
+        # Request latency and the rows it was for, for the dry run's projection
+        self.seconds_per_request = None
+        self.rows_per_request = None
+        self.error_rate = 0.0
+        self._resized = self.size != initial
+        self._lock = threading.Lock()
+
+    def observe(self, row_count, latency, payload_bytes, ok):
+        """Record one insert_many request; called from the dispatch threads."""
+        with self._lock:
+            if ok and row_count:
+                self.seconds_per_row = _smooth(self.seconds_per_row, latency / row_count)
+                self.seconds_per_request = _smooth(self.seconds_per_request, latency)
+                self.rows_per_request = _smooth(self.rows_per_request, row_count)
+                if payload_bytes:
+                    self.bytes_per_row = _smooth(self.bytes_per_row, payload_bytes / row_count)
+            self.error_rate = _smooth(self.error_rate, 0.0 if ok else 1.0)
+
+    def next_size(self):
+        """Size for the next batch and, if it changed, why: (size, reason or None)."""
+        with self._lock:
+            if self._resized:
+                self._resized = False
+                return self.size, 'limit'
+
+            if self.seconds_per_row is None and self.error_rate <= ERROR_RATE_THRESHOLD:
+                # Nothing measured yet, the first batches are still on the wire
+                return self.size, None
+
+            candidates = [(self.max_size, 'limit')]
+            if self.seconds_per_row:
+                candidates.append((self.target_latency / self.seconds_per_row, 'latency'))
+            if self.bytes_per_row:
+                candidates.append((self.max_bytes / self.bytes_per_row, 'payload'))
+            size, reason = min(candidates)
+            if self.error_rate > ERROR_RATE_THRESHOLD:
+                size, reason = min(size, self.size * (1 - self.error_rate)), 'errors'
+
+            # Move at most a factor of two per batch so one outlier can't swing it
+            size = self._clamp(int(max(self.size / 2, min(self.size * 2, size))))
+            if abs(size - self.size) < self.size * MIN_CHANGE:
+                return self.size, None
+            self.size = size
+            return size, reason
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "ms_per_row": round(self.seconds_per_row * 1000, 2) if self.seconds_per_row else None,
+                "bytes_per_row": int(self.bytes_per_row) if self.bytes_per_row else None,
+                "ms_per_request": round(self.seconds_per_request * 1000, 1) if self.seconds_per_request else None,
+                "rows_per_request": round(self.rows_per_request, 1) if self.rows_per_request else None,
+                "error_rate": round(self.error_rate, 3),
+            }
+
+    def _clamp(self, size):
+        return max(self.min_size, min(self.max_size, size))
+
+
+def clamp_batch_size(size):
+    """size kept within IMPORT_MIN_BATCH_SIZE..IMPORT_MAX_BATCH_SIZE, adaptive batching or not."""
+    return max(app.config["IMPORT_MIN_BATCH_SIZE"], min(app.config["IMPORT_MAX_BATCH_SIZE"], size))
+
+
+def append_history(history, batch_num, start_row, size, reason, snapshot):
+    history.append({"batch": batch_num, "start_row": start_row, "size": size, "reason": reason, **snapshot})
+    del history[:-HISTORY_LIMIT]
+    return history
+
+
+def _smooth(average, sample):
+    return sample if average is None else average + SMOOTHING * (sample - average)
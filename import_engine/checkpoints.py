@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+
+from app import db
+from models import ImportBatch
+from frappe_api.schema_cache import get_doctype_schema
+
+# Every batch gets an ImportBatch row: 'sent' when it goes on the wire,
+# then 'acknowledged' with the names Frappe created, or 'failed'. The rows
+# are committed with the job's progress (see job_store), not one by one
+# unless the doctype has no natural key to deduplicate with. A resumed job
+# skips acknowledged batches. Any other batch may or may not have been
+# committed by Frappe, including batches whose checkpoint was never flushed,
+# so in a resumed run every batch is deduplicated against the site (see
+# IdempotencyKey) before it is sent.
+
+
+def load_checkpoints(job):
+    return {batch.batch_num: batch for batch in ImportBatch.query.filter_by(job_id=job.id)}
+
+
+def mark_sent(checkpoints, job, batch_num, start_row, row_count):
+    checkpoint = checkpoints.get(batch_num)
+    if not checkpoint:
+        checkpoint = ImportBatch(job_id=job.id, batch_num=batch_num, attempts=0)
+        db.session.add(checkpoint)
+        checkpoints[batch_num] = checkpoint
+    checkpoint.start_row = start_row
+    checkpoint.row_count = row_count
+    checkpoint.status = 'sent'
+    checkpoint.attempts += 1
+    return checkpoint
+
+
+def mark_acknowledged(checkpoint, names):
+    checkpoint.status = 'acknowledged'
+    checkpoint.names = json.dumps(names or [])
+    checkpoint.error_message = None
+
+
+def mark_failed(checkpoint, error):
+    checkpoint.status = 'failed'
+    checkpoint.error_message = str(error)
+
+
+def is_uncertain(checkpoint):
+    """True if an earlier attempt of this batch may have reached Frappe."""
+    return checkpoint is not None and checkpoint.status in ('sent', 'failed')
+
+
+class IdempotencyKey:
+    """How docs of a job are recognised on the site when a batch is retried.
+
+    field is the natural key to look docs up by: the job's natural_key, the
+    field an autoname "field:<fieldname>" doctype is named after, or `name`
+    when the upload supplies names itself. For Prompt-named doctypes without
+    a name column, docs get a deterministic name hashed from job and row.
+    """
+
+    def __init__(self, client, doctype, field, hash_prefix=None):
+        self.client = client
+        self.doctype = doctype
+        self.field = field
+        self.hash_prefix = hash_prefix
+
+    @classmethod
+    def resolve(cls, job, conn, plan, client):
+        if job.natural_key:
+            return cls(client, job.doctype, job.natural_key)
+        if any(slot.fieldname == 'name' for slot in plan.main_fields):
+            return cls(client, job.doctype, 'name')
+
+        try:
+            meta = json.loads(get_doctype_schema(conn, job.doctype).meta)
+            autoname = (meta['docs'][0].get('autoname') or '').strip()
+        except Exception as e:
+            logging.warning(f"Could not read autoname of {job.doctype}: {str(e)}")
+            autoname = ''
+
+        if autoname.startswith('field:'):
+            return cls(client, job.doctype, autoname[len('field:'):])
+        if autoname.lower() == 'prompt':
+            return cls(client, job.doctype, 'name', hash_prefix=f"{job.doctype}:{job.id}")
+
+        logging.warning(f"No natural key for {job.doctype}; batches that may have reached the site are not retried")
+        return None
+
+    def prepare(self, docs, start_row):
+        if self.hash_prefix:
+            for offset, doc in enumerate(docs):
+                doc.setdefault('name', _name_hash(self.hash_prefix, start_row + offset))
+        return docs
+
+    def dedupe(self, docs):
+        """Split docs into those still to insert and (doc, name) of those already on the site."""
+        keys = [str(doc[self.field]) for doc in docs if doc.get(self.field) not in (None, '')]
+        if not keys:
+            return docs, []
+
+        response = self.client.get_list(
+            self.doctype, filters=[[self.field, "in", keys]], fields=["name", self.field])
+        if not response.ok:
+            raise Exception(f"Failed to check existing {self.doctype} records: {response.text}")
+
+        found = {str(row.get(self.field)): row['name'] for row in response.json().get('message') or []}
+        remaining = [doc for doc in docs if str(doc.get(self.field)) not in found]
+        existing = [(doc, found[str(doc.get(self.field))]) for doc in docs if str(doc.get(self.field)) in found]
+        return remaining, existing
+
+
+def _name_hash(prefix, row):
+    return hashlib.sha1(f"{prefix}:{row}".encode()).hexdigest()[:16]
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, wait
+
+import requests
+from app import app
+from frappe_api import get_async_client, io_loop
+
+# Frappe answers 429 when the site's rate limiter kicks in and 5xx when its
+# gunicorn workers are saturated; both are worth retrying after a pause.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A 500/502/504 or a dropped connection may come after the docs were
+# committed, so without an idempotency key to find them by only the
+# responses refusing the request outright are retried.
+REFUSED_STATUSES = {429, 503}
+
+# Batches are sent by coroutines on the shared io_loop (see
+# frappe_api.async_client) rather than by a thread pool per job, so the
+# number of batches in flight across all jobs isn't bounded by threads.
+# send_batch and send_batch_isolating are coroutines; callers on ordinary
+# threads run them with io_loop.run().
+
+class BatchResult(namedtuple('BatchResult', ['batch_num', 'row_count', 'names', 'error', 'failures', 'warnings'])):
+    """names of the batch's records on the site, failures (doc, message) of rejected docs.
+
+    warnings are (doc, message) of docs that were inserted, but with
+    something left undone, e.g. their linked records.
+    """
+
+
+class UncertainBatchError(Exception):
+    """A batch that failed after it may have been inserted, sent without an idempotency key."""
+
+    def __init__(self, cause):
+        super().__init__(
+            f"{cause}. The batch may have been inserted all the same, so it was not retried; "
+            f"resume with a natural_key, a field identifying the records, to have it retried safely"
+        )
+
+
+class InsertError(Exception):
+    def __init__(self, response):
+        super().__init__(f"Failed to create records: {response.text}")
+        self.status_code = response.status_code
+        self.message = frappe_error_message(response)
+
+    @property
+    def is_row_error(self):
+        # 417 ValidationError, 409 DuplicateEntryError, 404 LinkValidationError...
+        # caused by the docs themselves, unlike auth, rate limit or server errors
+        return 400 <= self.status_code < 500 and self.status_code not in (401, 403, 429)
+
+
+def frappe_error_message(response):
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text[:500]
+
+    messages = []
+    for message in json.loads(data.get('_server_messages') or '[]'):
+        try:
+            messages.append(json.loads(message).get('message', message))
+        except (ValueError, AttributeError):
+            messages.append(message)
+    if messages:
+        return '; '.join(str(message) for message in messages)
+    return str(data.get('exception') or data.get('exc_type') or response.text[:500])
+
+
+class ConnectionThrottle:
+    """In-flight window shared by every job importing into one Frappe site.
+
+    The window grows by one after each full window of successful requests and
+    halves on 429/5xx (AIMD), so concurrency settles at what the site can absorb.
+    A throttled response also pauses all senders for the backoff delay.
+    Used from the coroutines on io_loop.
+    """
+
+    def __init__(self, max_inflight):
+        self.max_inflight = max_inflight
+        self.limit = max_inflight
+        self.inflight = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.inflight >= self.limit:
+                    await self._cond.wait()
+                else:
+                    break
+            self.inflight += 1
+
+    async def release(self, backoff=None):
+        async with self._cond:
+            self.inflight -= 1
+            if backoff is not None:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_inflight:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+def get_throttle(connection_id):
+    with _throttles_lock:
+        if connection_id not in _throttles:
+            _throttles[connection_id] = ConnectionThrottle(app.config["IMPORT_MAX_INFLIGHT_PER_CONNECTION"])
+        return _throttles[connection_id]
+
+
+def backoff_delay(attempt, response=None):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    delay = min(app.config["IMPORT_BACKOFF_MAX"], app.config["IMPORT_BACKOFF_BASE"] * 2 ** attempt)
+    return delay * (0.5 + random.random() / 2)
+
+
+async def send_batch(throttle, client, docs, idempotency=None, uncertain=False, observe=None, timer=None,
+                     key_field=None):
+    """POST one batch to insert_many, retrying 429/5xx and connection errors.
+
+    A failed attempt may still have been committed by Frappe, so before any
+    retry (and before the first attempt of an uncertain batch) docs that
+    already exist are dropped via idempotency.dedupe. Without idempotency
+    only 429/503 are retried; other failures raise UncertainBatchError
+    rather than risk inserting the docs twice. client is an
+    AsyncFrappeClient. Returns ([(doc, name), ...] for the docs inserted
+    now, names) where names are those of all the batch's records, inserted
+    now or found to exist; name is None for docs match_names couldn't pair
+    with theirs, which are in names all the same.
+    observe(row_count, latency, payload_bytes, ok) is called for every
+    request except rate-limited ones, which say nothing about the batch.
+    timer (a metrics.StageTimer) gets the serialize and http_wait stages.
+    key_field is passed to match_names.
+    """
+    max_retries = app.config["IMPORT_MAX_RETRIES"]
+    retry_statuses = RETRY_STATUSES if idempotency else REFUSED_STATUSES
+    existing = []
+    attempt = 0
+    while True:
+        if idempotency and (uncertain or attempt):
+            docs, found = await asyncio.to_thread(idempotency.dedupe, docs)
+            existing += [name for _, name in found]
+        if not docs:
+            return [], existing
+
+        started = time.monotonic()
+        body, headers = await client.encode_insert_many(docs)
+        if timer:
+            timer.add('serialize', time.monotonic() - started)
+
+        await throttle.acquire()
+        started = time.monotonic()
+        try:
+            # Retries are driven from here so they go through the shared throttle
+            response = await client.post_insert_many(body, headers, retries=0)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if timer:
+                timer.add('http_wait', time.monotonic() - started)
+            if observe:
+                observe(len(docs), time.monotonic() - started, None, False)
+            if not idempotency:
+                # Still slows down the job's other batches
+                await throttle.release(backoff=backoff_delay(attempt))
+                raise UncertainBatchError(e) from e
+            if attempt >= max_retries:
+                await throttle.release()
+                raise
+            await throttle.release(backoff=backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        if timer:
+            timer.add('http_wait', time.monotonic() - started)
+        if observe and response.status_code != 429:
+            observe(len(docs), time.monotonic() - started, len(body), response.ok)
+        if response.status_code in retry_statuses and attempt < max_retries:
+            delay = backoff_delay(attempt, response)
+            logging.warning(f"Frappe returned {response.status_code}, backing off {delay:.1f}s")
+            await throttle.release(backoff=delay)
+            attempt += 1
+            continue
+
+        if response.status_code in RETRY_STATUSES - REFUSED_STATUSES and not idempotency:
+            await throttle.release(backoff=backoff_delay(attempt, response))
+            raise UncertainBatchError(InsertError(response))
+        await throttle.release()
+        if not response.ok:
+            raise InsertError(response)
+        names = response.json().get('message') or []
+        return await match_names(client, docs, names, key_field), existing + names
+
+
+async def match_names(client, docs, names, key_field=None):
+    """(doc, name) for docs just inserted by insert_many, which returned names.
+
+    insert_many collects the names in a set, so they don't come back in the
+    order of the docs. A lone doc, or docs that carry their name, map
+    directly; otherwise the new records are looked up by key_field, a field
+    each doc carries. A doc whose name can't be told apart, because there is
+    no key_field or another doc of the batch has the same key, gets None.
+    """
+    if len(docs) == 1 and len(names) == 1:
+        return [(docs[0], names[0])]
+    created = set(names)
+    if all(doc.get('name') in created for doc in docs):
+        return [(doc, doc['name']) for doc in docs]
+    if not key_field or not names:
+        return [(doc, None) for doc in docs]
+
+    response = await client.get_list(
+        docs[0]['doctype'], filters=[["name", "in", names]], fields=["name", key_field])
+    if not response.ok:
+        logging.warning(f"Could not look up the names of inserted {docs[0]['doctype']} records: {response.text[:200]}")
+        return [(doc, None) for doc in docs]
+
+    names_by_key = {}
+    for row in response.json().get('message') or []:
+        names_by_key.setdefault(str(row.get(key_field)), []).append(row['name'])
+    matched = []
+    for doc in docs:
+        candidates = names_by_key.get(str(doc.get(key_field)), [])
+        matched.append((doc, candidates[0] if len(candidates) == 1 else None))
+    return matched
+
+
+async def send_batch_isolating(throttle, client, docs, idempotency=None, uncertain=False, observe=None, timer=None,
+                               key_field=None):
+    """send_batch that bisects a rejected batch down to the failing docs.
+
+    insert_many rolls back the whole request when one doc fails, so the halves
+    are resent until each failing doc is alone; the good docs still go out in
+    the largest chunks possible. Returns send_batch's (named, names) and
+    [(doc, message), ...].
+    """
+    try:
+        return (*await send_batch(throttle, client, docs, idempotency, uncertain, observe, timer, key_field), [])
+    except InsertError as e:
+        if not e.is_row_error:
+            raise
+        if len(docs) == 1:
+            return [], [], [(docs[0], e.message)]
+
+    middle = len(docs) // 2
+    left_named, left_names, left_failures = await send_batch_isolating(
+        throttle, client, docs[:middle], idempotency, observe=observe, timer=timer, key_field=key_field)
+    right_named, right_names, right_failures = await send_batch_isolating(
+        throttle, client, docs[middle:], idempotency, observe=observe, timer=timer, key_field=key_field)
+    return left_named + right_named, left_names + right_names, left_failures + right_failures
+
+
+def clamp_max_inflight(max_inflight):
+    """max_inflight kept within 1..IMPORT_MAX_INFLIGHT_PER_JOB."""
+    return max(1, min(app.config["IMPORT_MAX_INFLIGHT_PER_JOB"], max_inflight))
+
+
+class BatchDispatcher:
+    """Keeps up to max_inflight insert_many batches of one job on the wire."""
+
+    def __init__(self, conn, max_inflight, idempotency=None, isolate_errors=False, observe=None, timer=None,
+                 key_field=None):
+        self.client = get_async_client(conn)
+        self.idempotency = idempotency
+        # Field the names of a batch with an after_insert hook are matched by
+        self.key_field = key_field
+        self.isolate_errors = isolate_errors
+        self.observe = observe
+        self.timer = timer
+        self.throttle = get_throttle(conn.id)
+        self.max_inflight = max(1, max_inflight)
+        self._pending = {}
+
+    def submit(self, batch_num, docs, row_count, uncertain=False, after_insert=None):
+        """Queue a batch, blocking while the job's window is full.
+
+        after_insert(named) runs on a worker thread once the batch is on
+        the site, e.g. to insert records linked to it. named pairs the docs
+        the batch inserted with their names; docs a resumed or retried batch
+        found on the site already are left out, so their linked records
+        aren't created twice. It returns (failures, warnings), both lists
+        of (doc, message): docs to count as rejected and docs that are on
+        the site but need a look. Returns the BatchResults of any batches
+        that finished in the meantime.
+        """
+        finished = []
+        if len(self._pending) >= self.max_inflight:
+            finished = self._collect(FIRST_COMPLETED)
+        future = io_loop.submit(self._send(docs, uncertain, after_insert))
+        self._pending[future] = (batch_num, row_count)
+        return finished
+
+    def send_linked(self, docs):
+        """Insert records that belong to a batch, e.g. its addresses; returns (named, failures).
+
+        They go through the connection's throttle but are not deduplicated
+        with the job's natural key nor counted by the batch sizer. Blocks, so
+        it is for after_insert hooks rather than the loop. Their names aren't
+        matched to the docs, so named pairs a doc with None unless it carries
+        its name or is sent alone.
+        """
+        if self.isolate_errors:
+            named, _, failures = io_loop.run(send_batch_isolating(self.throttle, self.client, docs, timer=self.timer))
+            return named, failures
+        named, _ = io_loop.run(send_batch(self.throttle, self.client, docs, timer=self.timer))
+        return named, []
+
+    async def _send(self, docs, uncertain, after_insert):
+        # Only hooks need to know which name is which doc's
+        key_field = self.key_field if after_insert else None
+        if self.isolate_errors:
+            named, names, failures = await send_batch_isolating(
+                self.throttle, self.client, docs, self.idempotency, uncertain, self.observe, self.timer, key_field)
+        else:
+            named, names = await send_batch(
+                self.throttle, self.client, docs, self.idempotency, uncertain, self.observe, self.timer, key_field)
+            failures = []
+        warnings = []
+        if after_insert:
+            try:
+                # Hooks are blocking code (handlers insert through send_linked)
+                hook_failures, warnings = await asyncio.to_thread(after_insert, named)
+            except Exception as e:
+                # The batch's docs are in; failing it would have a resumed run resend them
+                logging.exception("after_insert hook failed")
+                hook_failures = [(doc, f"Imported, but after_insert failed: {e}") for doc, _ in named]
+            failures = failures + hook_failures
+        return names, failures, warnings
+
+    def drain(self):
+        return self._collect()
+
+    def close(self):
+        # Batches still on the wire are left to finish rather than cancelled;
+        # the site may commit a request whatever happens to the client
+        if self._pending:
+            wait(list(self._pending))
+        self._pending.clear()
+
+    def _collect(self, return_when=ALL_COMPLETED):
+        if not self._pending:
+            return []
+        done, _ = wait(list(self._pending), return_when=return_when)
+        results = []
+        for future in done:
+            batch_num, row_count = self._pending.pop(future)
+            try:
+                names, failures, warnings = future.result()
+                results.append(BatchResult(batch_num, row_count, names, None, failures, warnings))
+            except Exception as e:
+                results.append(BatchResult(batch_num, row_count, None, e, [], []))
+        return sorted(results, key=lambda result: result.batch_num)
+
+
+class ProgressTracker:
+    """Ordered progress accounting for out-of-order batch acknowledgements.
+
+    processed_rows only counts acknowledged batches; current_batch is the
+    contiguous watermark, i.e. every batch below it has been acknowledged.
+    acked seeds the tracker with {batch_num: row_count} of a resumed job.
+    """
+
+    def __init__(self, acked=None):
+        self.current_batch = 0
+        self.processed_rows = 0
+        self.acked = set()
+        for batch_num, row_count in (acked or {}).items():
+            self.ack(batch_num, row_count)
+
+    def ack(self, batch_num, row_count):
+        self.processed_rows += row_count
+        self.acked.add(batch_num)
+        while self.current_batch in self.acked:
+            self.current_batch += 1
@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app import app
+from frappe_api import encode_insert_many
+from models import ImportJob
+from template_handlers import get_template_handler
+from .batch_sizing import clamp_batch_size
+from .dispatch import clamp_max_inflight
+from .mapping_plan import MappingPlan
+from .metrics import StageTimer
+from .parsed_cache import source_path
+from .reader import iter_sized_chunks, read_columns
+from .runner import doctype_field_types
+
+# A dry run pushes an upload through the same pipeline as an import (reader,
+# template handler split, mapping plan, insert_many encoding) but never POSTs,
+# and reports where the time goes. The projection adds the insert_many time
+# the site would need: the batches times the request latency at the job's
+# batch size, spread over max_inflight requests at a time. The latency comes
+# from what the batch sizer measured for the same doctype on the connection
+# (see _request_ms); reading and sending overlap during a real import, so the
+# slower of the two sets the pace.
+
+
+def dry_run_import(job, conn):
+    """Run the job's upload through the import pipeline without sending it; returns the report."""
+    timer = StageTimer(sample_rss=True)
+    with timer.stage('plan'):
+        handler = get_template_handler(job.doctype)
+        source = source_path(job)
+        columns = read_columns(source)
+        if handler:
+            columns = list(handler.process_template(pd.DataFrame(columns=columns))[0].columns)
+        plan = MappingPlan.compile(columns, json.loads(job.mapping or '{}'), doctype_field_types(conn, job.doctype))
+
+    # The size the import would start with (see runner.ImportRun._batch_size)
+    batch_size = clamp_batch_size(job.batch_size)
+    rows = batches = payload_bytes = 0
+    chunks = iter_sized_chunks(source, lambda: batch_size, app.config["IMPORT_READ_CHUNK_SIZE"])
+    for batch_df in timer.timed('read', chunks):
+        if handler:
+            with timer.stage('split'):
+                batch_df, _ = handler.process_template(batch_df)
+        with timer.stage('map'):
+            docs, _ = plan.to_indexed_docs(batch_df, job.doctype)
+        with timer.stage('serialize'):
+            body, _ = encode_insert_many(docs)
+        rows += len(batch_df)
+        batches += 1
+        payload_bytes += len(body)
+
+    report = timer.report(rows)
+    report.update({
+        "dry_run": True,
+        "job_id": job.id,
+        "batches": batches,
+        "batch_size": batch_size,
+        "payload_bytes": payload_bytes,
+        "projection": _projection(job, conn, batches, batch_size, report["elapsed_seconds"]),
+    })
+    return report
+
+
+def _projection(job, conn, batches, batch_size, local_seconds):
+    max_inflight = clamp_max_inflight(job.max_inflight or app.config["IMPORT_MAX_INFLIGHT_PER_JOB"])
+    request_ms = _request_ms(_measurements(conn, job.doctype), batch_size)
+    if request_ms is None:
+        return {
+            "wall_clock_seconds": None,
+            "local_seconds": local_seconds,
+            "note": f"No insert_many latency measured for {job.doctype} on this connection yet; "
+                    f"run a small import first",
+        }
+    insert_seconds = batches * request_ms / 1000 / max_inflight
+    return {
+        "wall_clock_seconds": round(max(local_seconds, insert_seconds), 1),
+        "local_seconds": local_seconds,
+        "insert_seconds": round(insert_seconds, 1),
+        "ms_per_request": round(request_ms, 1),
+        "max_inflight": max_inflight,
+    }
+
+
+def _measurements(conn, doctype):
+    """(rows per request, ms per request) the batch sizer logged for doctype on conn."""
+    # The batch sizer logs its measurements with every size change
+    jobs = ImportJob.query.filter(
+        ImportJob.connection_id == conn.id,
+        ImportJob.doctype == doctype,
+        ImportJob.batch_size_history.isnot(None)
+    ).order_by(ImportJob.updated_at.desc()).limit(20)
+    points = []
+    for job in jobs:
+        for entry in json.loads(job.batch_size_history or '[]'):
+            if entry.get('ms_per_request') and entry.get('rows_per_request'):
+                points.append((entry['rows_per_request'], entry['ms_per_request']))
+            elif entry.get('ms_per_row'):
+                # Logged before request latencies were; taken at the size it led to
+                points.append((entry['size'], entry['ms_per_row'] * entry['size']))
+    return points
+
+
+def _request_ms(points, batch_size):
+    """Latency of an insert_many of batch_size rows, None without measurements.
+
+    Requests cost a fixed overhead plus a time per row, so with measurements
+    at more than one size a line is fitted through them; a single size is
+    scaled by the rows.
+    """
+    if not points:
+        return None
+    sizes = np.array([size for size, _ in points], dtype=float)
+    latencies = np.array([latency for _, latency in points], dtype=float)
+    if len(np.unique(sizes)) > 1:
+        per_row, overhead = np.polyfit(sizes, latencies, 1)
+        if per_row > 0:
+            return max(overhead, 0.0) + per_row * batch_size
+    return float(np.mean(latencies / sizes)) * batch_size
@@ -0,0 +1,35 @@
+import io
+import os
+
+import pandas as pd
+
+# Rows rejected by Frappe in error isolation mode are appended to a per-job
+# CSV next to the uploads: the original columns plus an Error column, so the
+# file can be fixed and uploaded again as is.
+
+UPLOAD_FOLDER = 'uploads'
+ERROR_COLUMN = 'Error'
+
+
+def error_file_path(job):
+    return os.path.join(UPLOAD_FOLDER, f"job_{job.id}_errors.csv")
+
+
+def append_failed_rows(job, rows_df, messages):
+    path = error_file_path(job)
+    rows_df.assign(**{ERROR_COLUMN: messages}).to_csv(
+        path, mode='a', header=not os.path.exists(path), index=False)
+    job.error_file = path
+
+
+def error_file_as_xlsx(path):
+    buffer = io.BytesIO()
+    pd.read_csv(path, dtype=str, keep_default_na=False).to_excel(
+        buffer, index=False, sheet_name='Errors', engine='openpyxl')
+    buffer.seek(0)
+    return buffer
+
+
+def remove_error_file(job):
+    if job.error_file and os.path.exists(job.error_file):
+        os.remove(job.error_file)
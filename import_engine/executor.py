@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from app import app, db
+from models import ImportJob, FrappeConnection
+from .job_store import set_status
+from .migration_plan import ready_jobs
+from .progress import bus, publish_job
+from .runner import run_import
+
+# The import_job table is the queue: a job is enqueued by flipping its status
+# to 'queued' and handed to a local thread pool. Workers claim a job with a
+# conditional UPDATE so the same row is never run twice, even when several
+# processes (gunicorn workers, the debug reloader) share the SQLite file.
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = False
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config["IMPORT_WORKERS"],
+                thread_name_prefix="import-worker"
+            )
+    return _executor
+
+
+def enqueue(job_id):
+    get_executor().submit(_run_job, job_id)
+
+
+def recover_queued_jobs_once():
+    """recover_queued_jobs() on the first request a process serves."""
+    global _recovered
+    with _executor_lock:
+        if _recovered:
+            return
+        _recovered = True
+    recover_queued_jobs()
+
+
+def recover_queued_jobs():
+    """Resubmit jobs that were queued but never picked up (e.g. after a restart)."""
+    job_ids = [job_id for (job_id,) in db.session.query(ImportJob.id).filter_by(status='queued')]
+    for job_id in job_ids:
+        enqueue(job_id)
+    if job_ids:
+        logging.info(f"Recovered {len(job_ids)} queued import job(s)")
+
+    # Plan steps whose prerequisites completed just before a restart
+    plan_ids = db.session.query(ImportJob.plan_id).filter(
+        ImportJob.status == 'pending', ImportJob.plan_id.isnot(None)).distinct()
+    for (plan_id,) in plan_ids.all():
+        start_ready_jobs(plan_id)
+
+
+def start_ready_jobs(plan_id):
+    """Queue the pending jobs of a migration plan whose prerequisites have completed."""
+    started = []
+    for job in ready_jobs(plan_id):
+        # Several prerequisites can complete at once; only one caller queues the job
+        result = db.session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job.id, ImportJob.status == 'pending')
+            .values(status='queued')
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            publish_job(db.session.get(ImportJob, job.id))
+            enqueue(job.id)
+            started.append(job.id)
+    return started
+
+
+def remove_upload(job):
+    if job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+
+def is_resumable(job):
+    """Failed jobs, and jobs stuck in processing because their worker died."""
+    if job.status == 'failed':
+        return True
+    stale_after = timedelta(seconds=app.config["IMPORT_STALE_AFTER"])
+    return job.status == 'processing' and job.updated_at < datetime.utcnow() - stale_after
+
+
+def _claim(job_id):
+    result = db.session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.status == 'queued')
+        .values(status='processing', run_count=func.coalesce(ImportJob.run_count, 0) + 1)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _run_job(job_id):
+    with app.app_context():
+        try:
+            if not _claim(job_id):
+                return
+
+            bus.attach(job_id)
+            job = db.session.get(ImportJob, job_id)
+            publish_job(job)
+            try:
+                conn = db.session.get(FrappeConnection, job.connection_id)
+                if not conn:
+                    raise Exception("Connection not found for this import job")
+
+                run_import(job, conn)
+                set_status(job, 'completed')
+            except Exception as e:
+                logging.exception(f"Import job {job_id} failed")
+                db.session.rollback()
+                set_status(job, 'failed', error_message=str(e))
+
+            # Failed jobs keep their upload so they can be resumed
+            if job.status == 'completed':
+                remove_upload(job)
+                if job.plan_id:
+                    start_ready_jobs(job.plan_id)
+        except Exception:
+            logging.exception(f"Import worker crashed on job {job_id}")
+        finally:
+            bus.detach(job_id)
+            db.session.remove()
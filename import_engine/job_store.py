@@ -0,0 +1,56 @@
+import time
+
+from app import app, db
+from .progress import publish_job
+
+# ImportJob state is written through here. A running import acknowledges
+# batches far more often than anyone needs them on disk (watchers read the
+# progress bus), so progress, batch checkpoints and batch size changes are
+# committed together every JOB_FLUSH_EVERY_BATCHES batches or
+# JOB_FLUSH_INTERVAL_MS: one short write transaction on the SQLite file
+# instead of two per batch. State transitions are committed immediately.
+# A crash loses at most the unflushed acknowledgements; a resumed run
+# deduplicates those batches against the site (see checkpoints). Jobs whose
+# doctype has no natural key can't be deduplicated, so their writer is
+# per_batch: each batch's checkpoint is committed before it is sent and again
+# once it is acknowledged, and a resumed run only resends the batches that
+# were on the wire.
+
+
+def set_status(job, status, **fields):
+    job.status = status
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+    publish_job(job)
+
+
+class ProgressWriter:
+
+    def __init__(self, every_batches=None, interval_ms=None, timer=None, per_batch=False):
+        # A metrics.StageTimer receiving the db_commit stage
+        self.timer = timer
+        self.per_batch = per_batch
+        self.every_batches = 1 if per_batch else every_batches or app.config["JOB_FLUSH_EVERY_BATCHES"]
+        self.interval = (interval_ms or app.config["JOB_FLUSH_INTERVAL_MS"]) / 1000
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def record_sent(self):
+        """Note a batch checkpointed as sent, committing it first if per_batch."""
+        if self.per_batch:
+            self.flush()
+
+    def record(self, batches=1):
+        """Note acknowledged batches, committing once enough have piled up."""
+        self._pending += batches
+        if self._pending >= self.every_batches or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        started = time.monotonic()
+        db.session.commit()
+        if self.timer:
+            self.timer.add('db_commit', time.monotonic() - started)
+        self._pending = 0
+        self._last_flush = time.monotonic()
@@ -0,0 +1,142 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ImporterMethods.Customer import get_field_mapping
+
+FieldSlot = namedtuple('FieldSlot', ['position', 'fieldname', 'fieldtype'])
+
+DATE_FORMATS = {
+    'Date': '%Y-%m-%d',
+    'Datetime': '%Y-%m-%d %H:%M:%S',
+    'Time': '%H:%M:%S',
+}
+
+
+class MappingPlan:
+    """Column layout of an upload, compiled once per job.
+
+    Headers are parsed a single time into the main-document fields and the
+    child-table (table, row_num, field) slots. Batches are then turned into
+    Frappe docs column by column from per-column value arrays instead of
+    iterrows(); a child row is only built for the records a vectorized null
+    mask over its cells says have data in it, so the empty row slots of wide
+    child-table templates cost nothing per record.
+    """
+
+    def __init__(self, main_fields, child_tables):
+        self.main_fields = main_fields
+        # {table: [(row_num, [FieldSlot, ...]), ...]} with rows in ascending order
+        self.child_tables = child_tables
+
+    @classmethod
+    def compile(cls, columns, mapping=None, field_types=None):
+        """Build the plan from the upload headers and the user's column mapping.
+
+        mapping maps an upload column to the Frappe field it should fill;
+        columns mapped to an empty value are skipped, unmapped columns use the
+        fieldname from their "fieldname [fieldtype] [options]" header.
+        field_types ({fieldname or table.fieldname: fieldtype}, from the schema
+        cache) supplies the type for columns whose header doesn't carry one.
+        """
+        mapping = mapping or {}
+        field_types = field_types or {}
+        main_fields = []
+        child_rows = {}
+        for position, column in enumerate(columns):
+            fieldname, fieldtype, options = get_field_mapping(column)
+            if column in mapping:
+                fieldname = mapping[column]
+                if not fieldname:
+                    continue
+
+            if '.' in fieldname:
+                parts = fieldname.split('.')
+                if len(parts) == 3:
+                    table_name, row_num, field_name = parts
+                    if not row_num.isdigit():
+                        raise ValueError(f"Invalid child table row number in column '{column}'")
+                    fieldtype = fieldtype or field_types.get(f"{table_name}.{field_name}")
+                    child_rows.setdefault(table_name, {}).setdefault(int(row_num), []).append(
+                        FieldSlot(position, field_name, fieldtype))
+            else:
+                main_fields.append(FieldSlot(position, fieldname, fieldtype or field_types.get(fieldname)))
+
+        child_tables = {
+            table_name: sorted(rows.items())
+            for table_name, rows in child_rows.items()
+        }
+        return cls(main_fields, child_tables)
+
+    def to_docs(self, batch_df, doctype):
+        return self.to_indexed_docs(batch_df, doctype)[0]
+
+    def to_indexed_docs(self, batch_df, doctype):
+        """to_docs plus the position in batch_df of the row each doc was built from."""
+        records = [{"doctype": doctype} for _ in range(len(batch_df))]
+        for slot in self.main_fields:
+            column = batch_df.iloc[:, slot.position]
+            values = _coerce(column, slot.fieldtype)
+            present = column.notna().to_numpy()
+            if present.all():
+                for record, value in zip(records, values):
+                    record[slot.fieldname] = value
+            else:
+                for i in np.flatnonzero(present).tolist():
+                    records[i][slot.fieldname] = values[i]
+
+        for table_name, rows in self.child_tables.items():
+            # Row slots in ascending order, so each record's rows are appended in order
+            for _, slots in rows:
+                self._add_child_rows(records, table_name, slots, batch_df)
+
+        positions = [i for i, record in enumerate(records) if len(record) > 1]
+        return [records[i] for i in positions], positions
+
+    @staticmethod
+    def _add_child_rows(records, table_name, slots, batch_df):
+        columns = [batch_df.iloc[:, slot.position] for slot in slots]
+        filled = np.column_stack([_filled(column) for column in columns])
+        used = np.flatnonzero(filled.any(axis=1)).tolist()
+        if not used:
+            return
+
+        fieldnames = [slot.fieldname for slot in slots]
+        # One tuple of cell values per record
+        cells = list(zip(*(_coerce(column, slot.fieldtype) for column, slot in zip(columns, slots))))
+        complete = filled.all(axis=1).tolist()
+        for i in used:
+            if complete[i]:
+                data = dict(zip(fieldnames, cells[i]))
+            else:
+                data = {fieldname: value for fieldname, value, ok in zip(fieldnames, cells[i], filled[i].tolist()) if ok}
+            records[i].setdefault(table_name, []).append(data)
+
+
+def _filled(column):
+    """Non-null and, for text, not just whitespace (child rows skip blank cells)."""
+    filled = column.notna().to_numpy()
+    if column.dtype == object and filled.any():
+        # Only the non-null cells need the whitespace check
+        filled[filled] = [not isinstance(value, str) or bool(value.strip()) for value in column.to_numpy()[filled]]
+    return filled
+
+
+def _coerce(column, fieldtype):
+    """Convert a column to JSON-native Python values once per batch."""
+    if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) == 'datetime':
+        # Dates in a column that also has text or blanks, as openpyxl reads them
+        column = pd.to_datetime(column, errors='coerce')
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.dt.strftime(DATE_FORMATS.get(fieldtype, DATE_FORMATS['Datetime'])).tolist()
+
+    if fieldtype in ('Int', 'Check') and pd.api.types.is_float_dtype(column):
+        # Integer columns with blanks are read as float; send 3, not 3.0
+        array = column.to_numpy()
+        notna = ~np.isnan(array)
+        result = array.astype(object)
+        result[notna] = array[notna].astype(np.int64).astype(object)
+        return result.tolist()
+
+    return column.tolist()
@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app import app
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PAGE_SIZE = resource.getpagesize() if resource else 4096
+
+# Time spent in each stage of the upload/import pipeline (read, validate,
+# map, serialize, http_wait, db_commit, ...) is recorded in histograms per
+# connection and per job, and served by /api/metrics in the Prometheus text
+# format. Only the METRICS_MAX_JOBS most recent jobs keep their own series,
+# so label cardinality stays bounded on a long-running server. The numbers
+# are per process: with several gunicorn workers, each one serves its own.
+
+# Upper bounds in seconds; stages range from sub-millisecond chunk mapping to
+# insert_many calls of tens of seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (stage, connection_id) -> Histogram
+        self._by_connection = {}
+        # job_id -> {stage: Histogram}, oldest job first
+        self._by_job = OrderedDict()
+        # connection_id -> rows acknowledged by the site
+        self._rows = {}
+
+    def observe(self, stage, seconds, connection_id=None, job_id=None):
+        with self._lock:
+            if connection_id is not None:
+                self._by_connection.setdefault((stage, connection_id), Histogram()).observe(seconds)
+            if job_id is not None:
+                if job_id not in self._by_job:
+                    self._by_job[job_id] = {}
+                    while len(self._by_job) > app.config["METRICS_MAX_JOBS"]:
+                        self._by_job.popitem(last=False)
+                self._by_job[job_id].setdefault(stage, Histogram()).observe(seconds)
+
+    def add_rows(self, connection_id, rows):
+        with self._lock:
+            self._rows[connection_id] = self._rows.get(connection_id, 0) + rows
+
+    def render(self):
+        """All series in the Prometheus text exposition format."""
+        with self._lock:
+            by_connection = sorted(self._by_connection.items(), key=lambda item: (str(item[0][0]), str(item[0][1])))
+            by_job = [(job_id, sorted(stages.items())) for job_id, stages in self._by_job.items()]
+            rows = sorted(self._rows.items(), key=lambda item: str(item[0]))
+
+            lines = [
+                "# HELP frappe_import_stage_seconds Time spent per pipeline stage, by connection",
+                "# TYPE frappe_import_stage_seconds histogram",
+            ]
+            for (stage, connection_id), histogram in by_connection:
+                lines += _histogram_lines(
+                    "frappe_import_stage_seconds", {"stage": stage, "connection": connection_id}, histogram)
+
+            lines += [
+                "# HELP frappe_import_job_stage_seconds Time spent per pipeline stage, by import job",
+                "# TYPE frappe_import_job_stage_seconds histogram",
+            ]
+            for job_id, stages in by_job:
+                for stage, histogram in stages:
+                    lines += _histogram_lines(
+                        "frappe_import_job_stage_seconds", {"stage": stage, "job": job_id}, histogram)
+
+            lines += [
+                "# HELP frappe_import_rows_total Rows acknowledged by the site, by connection",
+                "# TYPE frappe_import_rows_total counter",
+            ]
+            lines += [f'frappe_import_rows_total{{connection="{connection_id}"}} {count}' for connection_id, count in rows]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per pipeline stage of one upload or import.
+
+    Each measurement is also passed to sink(stage, seconds) when given, e.g.
+    to record it in the metrics histograms. With sample_rss, the process's
+    resident memory is sampled at the start and at the end of every stage,
+    so report() can say how much the run itself used rather than the
+    process's lifetime high-water mark. Safe to use from the dispatch
+    threads.
+    """
+
+    def __init__(self, sink=None, sample_rss=False):
+        self.sink = sink
+        self.seconds = OrderedDict()
+        self.sample_rss = sample_rss
+        self.rss_start = self.rss_peak = current_rss_mb() if sample_rss else None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        rss = current_rss_mb() if self.sample_rss else None
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            if rss is not None:
+                self.rss_peak = max(self.rss_peak, rss)
+        if self.sink:
+            self.sink(stage, seconds)
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def timed(self, stage, iterable):
+        """Iterate, counting the time spent producing each item as stage."""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(stage, time.perf_counter() - started)
+            yield item
+
+    def report(self, rows):
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            seconds = list(self.seconds.items())
+        return {
+            "rows": rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+            "stages": {
+                stage: {
+                    "seconds": round(total, 3),
+                    "rows_per_sec": round(rows / total, 1) if total > 0 else None,
+                }
+                for stage, total in seconds
+            },
+            **self._rss_report(),
+        }
+
+    def _rss_report(self):
+        if self.rss_start is None:
+            return {}
+        with self._lock:
+            peak = self.rss_peak
+        return {
+            "rss_start_mb": round(self.rss_start, 1),
+            "rss_peak_mb": round(peak, 1),
+            # Memory the run took on top of what the process held already
+            "rss_growth_mb": round(peak - self.rss_start, 1),
+        }
+
+
+def connection_sink(connection_id, job_id=None):
+    """StageTimer sink recording into the connection's (and job's) histograms."""
+    return lambda stage, seconds: metrics.observe(stage, seconds, connection_id, job_id)
+
+
+def current_rss_mb():
+    """Resident memory of the process now, None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * PAGE_SIZE / 2 ** 20
+
+
+def peak_rss_mb():
+    """High-water mark of the process's resident memory over its lifetime, None where unavailable."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _histogram_lines(name, labels, histogram):
+    label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    lines = [
+        f'{name}_bucket{{{label_text},le="{"+Inf" if bound == float("inf") else bound}"}} {count}'
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(f"{name}_sum{{{label_text}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+    return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
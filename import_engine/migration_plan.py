@@ -0,0 +1,90 @@
+import json
+
+from models import ImportJob
+from frappe_api.schema_cache import get_doctype_schema
+from .mapping_plan import MappingPlan
+from .parsed_cache import source_path
+from .reader import read_columns
+
+# A migration plan groups uploads that depend on each other, e.g. Customer
+# Group -> Customer -> Address -> Sales Order. A job depends on every other
+# job of the plan whose doctype one of its filled Link fields points to, read
+# from the cached DocType meta. Jobs without pending prerequisites run in
+# parallel on the import workers; a job is queued as soon as all of its
+# prerequisites have completed (see executor.start_ready_jobs). Links a job's
+# upload doesn't fill, links to its own doctype and Dynamic Links are not
+# dependencies.
+
+
+class PlanError(Exception):
+    pass
+
+
+def linked_doctypes(conn, job):
+    """Doctypes the Link fields filled by the job's upload point to."""
+    field_map = json.loads(get_doctype_schema(conn, job.doctype).field_map)
+    plan = MappingPlan.compile(read_columns(source_path(job)), json.loads(job.mapping or '{}'))
+    fieldnames = [slot.fieldname for slot in plan.main_fields]
+    fieldnames += [
+        f"{table_name}.{slot.fieldname}"
+        for table_name, rows in plan.child_tables.items()
+        for _, slots in rows
+        for slot in slots
+    ]
+
+    targets = set()
+    for fieldname in fieldnames:
+        field_type = field_map.get(fieldname, '')
+        if field_type.startswith('Link [') and field_type.endswith(']'):
+            targets.add(field_type[len('Link ['):-1])
+    targets.discard(job.doctype)
+    return targets
+
+
+def build_dependencies(conn, jobs):
+    """{job id: [ids of the jobs it waits for]}; raises PlanError on a cycle."""
+    dependencies = {}
+    for job in jobs:
+        targets = linked_doctypes(conn, job)
+        dependencies[job.id] = sorted(
+            other.id for other in jobs if other.id != job.id and other.doctype in targets
+        )
+
+    # Kahn's algorithm; whatever can't be ordered sits on a cycle
+    remaining = {job_id: set(deps) for job_id, deps in dependencies.items()}
+    while True:
+        ready = [job_id for job_id, deps in remaining.items() if not deps]
+        if not ready:
+            break
+        for job_id in ready:
+            del remaining[job_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    if remaining:
+        doctypes = sorted({job.doctype for job in jobs if job.id in remaining})
+        raise PlanError(f"Circular Link dependencies between {', '.join(doctypes)}")
+    return dependencies
+
+
+def ready_jobs(plan_id):
+    """Pending jobs of the plan whose prerequisites have all completed."""
+    jobs = ImportJob.query.filter_by(plan_id=plan_id).all()
+    completed = {job.id for job in jobs if job.status == 'completed'}
+    return [
+        job for job in jobs
+        if job.status == 'pending' and set(json.loads(job.depends_on or '[]')) <= completed
+    ]
+
+
+def plan_status(jobs):
+    statuses = {job.status for job in jobs}
+    if statuses <= {'completed'}:
+        return 'completed'
+    if statuses & {'queued', 'processing'}:
+        return 'running'
+    if 'failed' in statuses:
+        return 'failed'
+    if 'cancelled' in statuses:
+        return 'cancelled'
+    # Some steps done, the next ones about to be queued
+    return 'running' if 'completed' in statuses else 'pending'
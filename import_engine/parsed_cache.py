@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+import uuid
+
+from app import app
+
+# Uploads are parsed once. While the upload is validated, every chunk read
+# from the CSV/XLSX is also spilled to a cache directory named after the
+# SHA-256 of the file's content: one pickled DataFrame per row group plus a
+# manifest with the columns and row counts. Everything after the upload
+# (import, resume, migration plans) reads the cache instead of the original,
+# loading one row group at a time and skipping whole row groups to reach a
+# resume point. Uploading the same content again finds the cache and skips
+# parsing altogether. pyarrow isn't a dependency, so row groups are pickled
+# DataFrames rather than Arrow/Parquet; unpickling one is still a small
+# fraction of the cost of parsing it, openpyxl in particular.
+#
+# Caches are shared by content, so they are not removed with a job's upload;
+# prune() keeps their total size under PARSED_CACHE_MAX_BYTES, oldest use
+# first, never touching the caches of unfinished jobs.
+
+CACHE_FOLDER = os.path.join('uploads', 'parsed')
+# Bump when the reader's parsing changes so old caches aren't reused
+FORMAT_VERSION = 1
+SUFFIX = f'.v{FORMAT_VERSION}.parsed'
+MANIFEST = 'manifest.json'
+HASH_BLOCK_SIZE = 1024 * 1024
+# Temp directories left behind by a crashed upload are removed after this long
+STALE_TEMP_SECONDS = 60 * 60
+
+
+def save_upload(file, path):
+    """Save an uploaded FileStorage to path; returns the SHA-256 of its content."""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as out:
+        while True:
+            block = file.stream.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
+def cache_path(file_hash):
+    return os.path.join(CACHE_FOLDER, f"{file_hash}{SUFFIX}")
+
+
+def is_parsed(path):
+    return path.endswith(SUFFIX)
+
+
+def lookup(file_hash):
+    """Path of the parsed cache for the content hash, or None."""
+    if not file_hash:
+        return None
+    path = cache_path(file_hash)
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        return None
+    # Mark as recently used for prune()
+    os.utime(path)
+    return path
+
+
+def source_path(job):
+    """What the reader should read for a job: its parsed cache, else the original upload."""
+    return lookup(job.file_hash) or job.file_path
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def iter_row_groups(path, start_row=0):
+    """Yield the cached DataFrames, skipping the first start_row rows without loading them."""
+    skipped = 0
+    for index, row_count in enumerate(read_manifest(path)['row_groups']):
+        if skipped + row_count <= start_row:
+            skipped += row_count
+            continue
+        with open(_row_group_path(path, index), 'rb') as f:
+            chunk = pickle.load(f)
+        if skipped < start_row:
+            chunk = chunk.iloc[start_row - skipped:]
+            skipped = start_row
+        yield chunk
+
+
+class CacheWriter:
+    """Spills the chunks of an upload being parsed; nothing is visible until commit()."""
+
+    def __init__(self, file_hash):
+        self.path = cache_path(file_hash)
+        self.row_groups = []
+        self._temp = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        os.makedirs(self._temp)
+
+    def append(self, chunk):
+        with open(_row_group_path(self._temp, len(self.row_groups)), 'wb') as f:
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.row_groups.append(len(chunk))
+
+    def commit(self, columns):
+        with open(os.path.join(self._temp, MANIFEST), 'w') as f:
+            json.dump({
+                "columns": list(columns),
+                "rows": sum(self.row_groups),
+                "row_groups": self.row_groups,
+            }, f)
+        try:
+            os.rename(self._temp, self.path)
+        except OSError:
+            # The same content was cached by a concurrent upload
+            self.abort()
+
+    def abort(self):
+        shutil.rmtree(self._temp, ignore_errors=True)
+
+
+def prune(in_use):
+    """Remove the least recently used caches above PARSED_CACHE_MAX_BYTES, except in_use hashes."""
+    if not os.path.isdir(CACHE_FOLDER):
+        return
+    caches = []
+    now = time.time()
+    for name in os.listdir(CACHE_FOLDER):
+        path = os.path.join(CACHE_FOLDER, name)
+        if name.endswith('.tmp'):
+            if now - os.path.getmtime(path) > STALE_TEMP_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        if not is_parsed(name):
+            # Left by an older FORMAT_VERSION
+            shutil.rmtree(path, ignore_errors=True)
+            continue
+        size = sum(entry.stat().st_size for entry in os.scandir(path))
+        caches.append((os.path.getmtime(path), size, name[:-len(SUFFIX)], path))
+
+    total = sum(size for _, size, _, _ in caches)
+    for _, size, file_hash, path in sorted(caches):
+        if total <= app.config["PARSED_CACHE_MAX_BYTES"]:
+            break
+        if file_hash in in_use:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        logging.info(f"Removed parsed upload cache {file_hash}")
+
+
+def _row_group_path(path, index):
+    return os.path.join(path, f"{index:05d}.pkl")
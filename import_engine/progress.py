@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from app import app
+
+# Import workers publish a job snapshot to an in-process bus whenever batches
+# are acknowledged or the job changes state. /api/status/<id>/stream pushes
+# those snapshots to watchers as server-sent events, and /api/status serves
+# the latest one, so watching an import doesn't query the database. Only the
+# latest snapshot per job is kept: watchers want the current state, not every
+# intermediate one. A job run by another process (several gunicorn workers)
+# has no publisher here; its snapshot is read from the database instead, at
+# most once per PROGRESS_CACHE_TTL. Snapshots of jobs running in this process
+# are always current.
+
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+RATE_WINDOW = 30.0
+MAX_JOBS = 1000
+
+
+class ProgressBus:
+
+    def __init__(self, max_jobs=MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._seq = 0
+        # job_id -> (seq, published_at, snapshot)
+        self._snapshots = OrderedDict()
+        # Jobs whose worker runs in this process and keeps their snapshot current
+        self._running = set()
+        self._cond = threading.Condition()
+
+    def attach(self, job_id):
+        with self._cond:
+            self._running.add(job_id)
+
+    def detach(self, job_id):
+        with self._cond:
+            self._running.discard(job_id)
+
+    def publish(self, job_id, snapshot):
+        with self._cond:
+            self._seq += 1
+            self._snapshots[job_id] = (self._seq, time.monotonic(), snapshot)
+            self._snapshots.move_to_end(job_id)
+            while len(self._snapshots) > self.max_jobs:
+                self._snapshots.popitem(last=False)
+            self._cond.notify_all()
+            return self._seq
+
+    def refresh(self, job_id, snapshot):
+        """publish, except an unchanged snapshot only has its age reset and wakes nobody."""
+        with self._cond:
+            entry = self._snapshots.get(job_id)
+            if entry and entry[2] == snapshot:
+                self._snapshots[job_id] = (entry[0], time.monotonic(), snapshot)
+                return entry[0], snapshot
+        return self.publish(job_id, snapshot), snapshot
+
+    def latest(self, job_id, max_age=None):
+        """(seq, snapshot) of the job, or None if unknown or older than max_age seconds."""
+        with self._cond:
+            entry = self._snapshots.get(job_id)
+            if not entry:
+                return None
+            stale = max_age is not None and time.monotonic() - entry[1] > max_age
+            if stale and job_id not in self._running:
+                return None
+            return entry[0], entry[2]
+
+    def wait(self, job_id, after_seq, timeout):
+        """Block until the job has a snapshot newer than after_seq; None on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                entry = self._snapshots.get(job_id)
+                if entry and entry[0] > after_seq:
+                    return entry[0], entry[2]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+
+bus = ProgressBus()
+
+
+class RateMeter:
+    """Rows per second over the last RATE_WINDOW seconds of a running import."""
+
+    def __init__(self, processed_rows=0):
+        self._samples = deque([(time.monotonic(), processed_rows)])
+
+    def update(self, processed_rows):
+        now = time.monotonic()
+        self._samples.append((now, processed_rows))
+        while len(self._samples) > 2 and now - self._samples[1][0] > RATE_WINDOW:
+            self._samples.popleft()
+
+    @property
+    def rows_per_sec(self):
+        (start, start_rows), (end, end_rows) = self._samples[0], self._samples[-1]
+        if end <= start:
+            return None
+        return (end_rows - start_rows) / (end - start)
+
+
+def job_snapshot(job, meter=None):
+    rows_per_sec = meter.rows_per_sec if meter and job.status == 'processing' else None
+    remaining = max(0, (job.total_rows or 0) - (job.processed_rows or 0))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "processed_rows": job.processed_rows,
+        "total_rows": job.total_rows,
+        "current_batch": job.current_batch,
+        "total_batches": _estimate_total_batches(job, remaining),
+        "batch_size": job.batch_size,
+        "error_message": job.error_message,
+        "failed_rows": job.failed_rows or 0,
+        "error_file_url": f"/api/import/{job.id}/errors" if job.error_file else None,
+        "warning_rows": job.warning_rows or 0,
+        "warnings": json.loads(job.warnings or '[]'),
+        "batch_size_history": json.loads(job.batch_size_history or '[]'),
+        "rows_per_sec": round(rows_per_sec, 1) if rows_per_sec is not None else None,
+        "eta_seconds": round(remaining / rows_per_sec) if rows_per_sec else None,
+    }
+
+
+def publish_job(job, meter=None):
+    return bus.publish(job.id, job_snapshot(job, meter))
+
+
+def cached_snapshot(job_id, load_job):
+    """Latest snapshot of a job, falling back to load_job() (a DB read) when stale.
+
+    Returns (seq, snapshot), or None if load_job finds no such job.
+    """
+    cached = bus.latest(job_id, max_age=app.config["PROGRESS_CACHE_TTL"])
+    if cached:
+        return cached
+    job = load_job()
+    if job is None:
+        return None
+    return bus.refresh(job_id, job_snapshot(job))
+
+
+def _estimate_total_batches(job, remaining):
+    # Batch sizes adapt during the import, so the batches still to come are
+    # estimated from the current size
+    if not job.batch_size:
+        return 0
+    return (job.current_batch or 0) + (remaining + job.batch_size - 1) // job.batch_size
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from .parsed_cache import is_parsed, iter_row_groups, read_manifest
+
+# Streaming access to uploaded CSV/XLSX files. Everything downstream of the
+# upload (validation, row counting, batch mapping) consumes row chunks from
+# here, so peak memory is bounded by the chunk size rather than the file size.
+# Workbooks are read from their first sheet, like pd.read_excel, whichever
+# sheet was active when saved (templates carry a Validation sheet after it).
+# Each function also accepts the path of an upload's parsed cache (see
+# parsed_cache), which is read instead of parsing the original again.
+
+
+def is_csv(file_path):
+    return file_path.lower().endswith('.csv')
+
+
+def is_supported(file_path):
+    return file_path.lower().endswith(('.csv', '.xlsx', '.xls'))
+
+
+def read_columns(file_path):
+    if is_parsed(file_path):
+        return read_manifest(file_path)['columns']
+    if is_csv(file_path):
+        return pd.read_csv(file_path, nrows=0).columns.tolist()
+    if file_path.lower().endswith('.xls'):
+        return pd.read_excel(file_path, nrows=0).columns.tolist()
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        header = next(workbook.worksheets[0].iter_rows(values_only=True), ())
+        return _header_names(header)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(file_path, chunksize, start_row=0):
+    """Yield DataFrames of at most chunksize rows, skipping the first start_row rows."""
+    if is_parsed(file_path):
+        # Row groups before start_row are skipped without being loaded
+        for chunk in iter_row_groups(file_path, start_row):
+            yield from _slice(chunk, chunksize)
+        return
+
+    if is_csv(file_path):
+        chunks = pd.read_csv(file_path, chunksize=chunksize)
+    elif file_path.lower().endswith('.xls'):
+        # openpyxl cannot read the legacy format, fall back to a full parse
+        chunks = _slice(pd.read_excel(file_path), chunksize)
+    else:
+        chunks = _iter_xlsx_chunks(file_path, chunksize)
+
+    skipped = 0
+    for chunk in chunks:
+        if skipped + len(chunk) <= start_row:
+            skipped += len(chunk)
+            continue
+        if skipped < start_row:
+            chunk = chunk.iloc[start_row - skipped:]
+            skipped = start_row
+        yield chunk
+
+
+def iter_sized_chunks(file_path, next_size, read_chunksize, start_row=0):
+    """Like iter_chunks, but each chunk's size is taken from next_size() just before it is cut.
+
+    The file is still read read_chunksize rows at a time; chunks are sliced
+    out of that buffer, so sizes can change from one chunk to the next.
+    """
+    pending = []
+    buffered = 0
+    size = None
+    for chunk in iter_chunks(file_path, read_chunksize, start_row=start_row):
+        pending.append(chunk)
+        buffered += len(chunk)
+        while True:
+            if size is None:
+                size = max(1, next_size())
+            if buffered < size:
+                break
+            buffer = pd.concat(pending) if len(pending) > 1 else pending[0]
+            yield buffer.iloc[:size]
+            rest = buffer.iloc[size:]
+            pending = [rest] if len(rest) else []
+            buffered = len(rest)
+            size = None
+    if buffered:
+        yield pd.concat(pending) if len(pending) > 1 else pending[0]
+
+
+def count_rows(file_path, chunksize=10000):
+    if is_parsed(file_path):
+        return read_manifest(file_path)['rows']
+    return sum(len(chunk) for chunk in iter_chunks(file_path, chunksize))
+
+
+def _slice(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def _header_names(header):
+    return [str(name) if name is not None else f"Unnamed: {idx}" for idx, name in enumerate(header)]
+
+
+def _iter_xlsx_chunks(file_path, chunksize):
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = _header_names(next(rows, ()))
+        width = len(columns)
+
+        chunk = []
+        blank_rows = []
+        for row in rows:
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            # Hold blank rows back so trailing empty (formatted) rows are dropped
+            # like pd.read_excel does, while blank rows inside the data are kept.
+            if all(value is None for value in row):
+                blank_rows.append(row)
+                continue
+            chunk.extend(blank_rows)
+            blank_rows = []
+            chunk.append(row)
+            while len(chunk) >= chunksize:
+                yield _to_frame(chunk[:chunksize], columns)
+                chunk = chunk[chunksize:]
+        if chunk:
+            yield _to_frame(chunk, columns)
+    finally:
+        workbook.close()
+
+
+def _to_frame(rows, columns):
+    # Match pd.read_excel, which reports empty cells as NaN rather than None
+    return pd.DataFrame(rows, columns=columns).replace({None: np.nan})
@@ -0,0 +1,262 @@
+import itertools
+import json
+import logging
+import random
+import pandas as pd
+from app import app
+from frappe_api.schema_cache import get_doctype_schema, field_types
+from frappe_api import get_client
+from .checkpoints import (
+    load_checkpoints, mark_sent, mark_acknowledged, mark_failed, is_uncertain, IdempotencyKey
+)
+from .batch_sizing import BatchSizer, append_history, clamp_batch_size
+from .dispatch import BatchDispatcher, InsertError, ProgressTracker, clamp_max_inflight
+from .error_report import append_failed_rows
+from .job_store import ProgressWriter
+from .metrics import StageTimer, connection_sink, metrics
+from .progress import RateMeter, publish_job
+from .mapping_plan import MappingPlan
+from .parsed_cache import source_path
+from .reader import iter_sized_chunks, read_columns
+from template_handlers import get_template_handler
+
+# Rows of a job whose warnings are kept with their messages; the rest are counted
+WARNINGS_LIMIT = 100
+
+
+def run_import(job, conn):
+    """Push every batch of the job's upload to Frappe via insert_many.
+
+    Runs inside an import worker (see import_engine.executor). Up to
+    job.max_inflight batches are on the wire at once; progress is written to
+    the ImportJob row as batches are acknowledged so /api/status can report it.
+    Each batch is checkpointed, so a resumed job picks up at the first batch
+    that was not acknowledged. Unless IMPORT_ADAPTIVE_BATCHING is off, the
+    size of new batches follows insert_many latency (see batch_sizing).
+    """
+    ImportRun(job, conn).run()
+
+
+class ImportRun:
+
+    def __init__(self, job, conn):
+        self.job = job
+        self.conn_id = conn.id
+        # Stage timings go to the connection's and the job's /api/metrics histograms
+        self.timer = StageTimer(connection_sink(conn.id, job.id))
+        self.checkpoints = load_checkpoints(job)
+        self.tracker = ProgressTracker({
+            batch_num: checkpoint.row_count
+            for batch_num, checkpoint in self.checkpoints.items() if checkpoint.status == 'acknowledged'
+        })
+        # Columns a template handler splits off (e.g. Customer addresses) are
+        # not fields of the doctype; the handler imports them after each batch
+        self.handler = get_template_handler(job.doctype)
+        # The parsed cache of the upload when there is one, else the upload itself
+        self.source = source_path(job)
+        columns = read_columns(self.source)
+        if self.handler:
+            columns = list(self.handler.process_template(pd.DataFrame(columns=columns))[0].columns)
+        self.plan = MappingPlan.compile(
+            columns,
+            json.loads(job.mapping or '{}'),
+            doctype_field_types(conn, job.doctype)
+        )
+        self.idempotency = IdempotencyKey.resolve(job, conn, self.plan, get_client(conn))
+        self.sizer = None
+        if app.config["IMPORT_ADAPTIVE_BATCHING"]:
+            self.sizer = BatchSizer(
+                job.batch_size,
+                app.config["IMPORT_TARGET_BATCH_SECONDS"],
+                app.config["IMPORT_MAX_BATCH_BYTES"],
+                app.config["IMPORT_MIN_BATCH_SIZE"],
+                app.config["IMPORT_MAX_BATCH_SIZE"]
+            )
+        self.dispatcher = BatchDispatcher(
+            conn,
+            # Jobs configured before the limit was applied
+            clamp_max_inflight(job.max_inflight or app.config["IMPORT_MAX_INFLIGHT_PER_JOB"]),
+            self.idempotency,
+            isolate_errors=job.isolate_errors,
+            observe=self.sizer.observe if self.sizer else None,
+            timer=self.timer,
+            key_field=self.idempotency.field if self.idempotency else getattr(self.handler, 'name_key', None)
+        )
+        # First row of the next batch to be cut from the upload
+        self.next_row = 0
+        self.meter = RateMeter(self.tracker.processed_rows)
+        self.writer = ProgressWriter(timer=self.timer, per_batch=self.idempotency is None)
+        # A previous run may have sent batches it never got to checkpoint
+        self.resumed = (job.run_count or 0) > 1
+        # batch_num -> (batch_df, {id(doc): row position}) for batches on the wire,
+        # kept so rows rejected in isolation mode or by after_insert hooks can be
+        # written to the error file
+        self.in_flight = {}
+
+    def run(self):
+        try:
+            error = self._dispatch_batches()
+            if not error:
+                error = self._record_results(self.dispatcher.drain())
+        finally:
+            self.dispatcher.close()
+            self.writer.flush()
+
+        if error:
+            raise Exception(f"Error creating records: {str(error)}")
+
+    def _dispatch_batches(self):
+        job, tracker = self.job, self.tracker
+        # Batches are cut straight off the upload, so only the batches currently
+        # in flight are held in memory. Every batch below the watermark is
+        # acknowledged, so its checkpoint says where the remaining rows start.
+        self.next_row = sum(self.checkpoints[batch_num].row_count for batch_num in range(tracker.current_batch))
+        planned = itertools.count(tracker.current_batch)
+        batches = iter_sized_chunks(
+            self.source,
+            lambda: self._batch_size(next(planned)),
+            app.config["IMPORT_READ_CHUNK_SIZE"],
+            start_row=self.next_row
+        )
+        for batch_num, batch_df in enumerate(self.timer.timed('read', batches), start=tracker.current_batch):
+            batch_start = self.next_row
+            self.next_row += len(batch_df)
+            if batch_num in tracker.acked:
+                continue
+
+            with self.timer.stage('map'):
+                main_df, filtered_df = batch_df, None
+                if self.handler:
+                    main_df, filtered_df = self.handler.process_template(batch_df)
+                docs, positions = self.plan.to_indexed_docs(main_df, job.doctype)
+                if self.idempotency:
+                    docs = self.idempotency.prepare(docs, batch_start)
+
+            sample_rate = app.config["IMPORT_DEBUG_PAYLOAD_SAMPLE"]
+            if sample_rate and random.random() < sample_rate:
+                logging.debug(f"Job {job.id} batch {batch_num} payload: {json.dumps(docs, default=str)}")
+
+            uncertain = self.resumed or is_uncertain(self.checkpoints.get(batch_num))
+            after_insert = None
+            if filtered_df is not None:
+                after_insert = self._linked_import(filtered_df, docs, positions)
+            if job.isolate_errors or after_insert:
+                self.in_flight[batch_num] = (batch_df, {id(doc): position for doc, position in zip(docs, positions)})
+            mark_sent(self.checkpoints, job, batch_num, batch_start, len(batch_df))
+            self.writer.record_sent()
+            error = self._record_results(
+                self.dispatcher.submit(batch_num, docs, len(batch_df), uncertain=uncertain, after_insert=after_insert)
+            )
+            if error:
+                # Stop feeding new batches; the ones already in flight are settled by drain()
+                self._record_results(self.dispatcher.drain())
+                return error
+        return None
+
+    def _linked_import(self, filtered_df, docs, positions):
+        """after_insert hook importing the handler's records for one batch.
+
+        The batch only counts as acknowledged once they are in too; rows whose
+        related records fail are reported against the row's doc, also when
+        the handler raises (e.g. the related records' insert_many failed
+        outside isolation mode), as the batch's own records are in. Rows whose
+        record's name couldn't be matched to the row (see
+        dispatch.match_names) are warnings: the record is on the site, so the
+        row must not be offered for re-upload, but its related records were
+        skipped.
+        """
+        doc_at = dict(zip(positions, docs))
+        position_of = {id(doc): position for doc, position in zip(docs, positions)}
+        has_related = filtered_df.notna().any(axis=1).tolist()
+
+        def after_insert(named):
+            names = pd.Series([None] * len(filtered_df), dtype=object)
+            unmatched = []
+            for doc, name in named:
+                position = position_of[id(doc)]
+                if name is not None:
+                    names.iloc[position] = name
+                elif has_related[position]:
+                    unmatched.append((doc, "Imported, but its name could not be matched to the row; "
+                                           "its related records were not imported"))
+            try:
+                failures = self.handler.import_filtered_data(self.dispatcher.send_linked, filtered_df, names)
+            except Exception as e:
+                logging.exception(f"Job {self.job.id}: importing related records failed")
+                message = f"Imported, but its related records failed: {e.message if isinstance(e, InsertError) else e}"
+                failures = [
+                    (position, message) for position, name in enumerate(names.tolist())
+                    if name is not None and has_related[position]
+                ]
+            return [(doc_at[position], message) for position, message in failures], unmatched
+
+        return after_insert
+
+    def _record_warnings(self, start_row, doc_positions, warnings):
+        # Row numbers as in validation errors: 1-based, not counting the header
+        recorded = json.loads(self.job.warnings or '[]')
+        recorded += [
+            {"row": start_row + doc_positions[id(doc)] + 1, "message": message}
+            for doc, message in warnings
+        ]
+        self.job.warnings = json.dumps(recorded[:WARNINGS_LIMIT])
+        self.job.warning_rows = (self.job.warning_rows or 0) + len(warnings)
+
+    def _batch_size(self, batch_num):
+        checkpoint = self.checkpoints.get(batch_num)
+        if checkpoint:
+            # A batch sent before keeps its rows so a resumed job lines up with its checkpoints
+            return checkpoint.row_count
+        if not self.sizer:
+            # Jobs uploaded before the limits were applied at upload
+            return clamp_batch_size(self.job.batch_size)
+
+        size, reason = self.sizer.next_size()
+        if reason:
+            # Saved with the batch's checkpoint by mark_sent
+            history = json.loads(self.job.batch_size_history or '[]')
+            self.job.batch_size_history = json.dumps(
+                append_history(history, batch_num, self.next_row, size, reason, self.sizer.snapshot()))
+            self.job.batch_size = size
+        return size
+
+    def _record_results(self, results):
+        error = None
+        for result in results:
+            checkpoint = self.checkpoints[result.batch_num]
+            batch_df, doc_positions = self.in_flight.pop(result.batch_num, (None, None))
+            if result.error:
+                error = error or result.error
+                mark_failed(checkpoint, result.error)
+                continue
+
+            self.tracker.ack(result.batch_num, result.row_count)
+            metrics.add_rows(self.conn_id, result.row_count - len(result.failures))
+            mark_acknowledged(checkpoint, result.names)
+            if result.failures:
+                append_failed_rows(
+                    self.job,
+                    batch_df.iloc[[doc_positions[id(doc)] for doc, _ in result.failures]],
+                    [message for _, message in result.failures]
+                )
+                self.job.failed_rows = (self.job.failed_rows or 0) + len(result.failures)
+                checkpoint.error_message = f"{len(result.failures)} row(s) rejected"
+            if result.warnings:
+                self._record_warnings(checkpoint.start_row, doc_positions, result.warnings)
+
+        if results:
+            self.job.processed_rows = self.tracker.processed_rows
+            self.job.current_batch = self.tracker.current_batch
+            self.writer.record(len(results))
+            self.meter.update(self.tracker.processed_rows)
+            publish_job(self.job, self.meter)
+        return error
+
+
+def doctype_field_types(conn, doctype):
+    try:
+        return field_types(json.loads(get_doctype_schema(conn, doctype).field_map))
+    except Exception as e:
+        # Headers carry their own types, the schema only fills the gaps
+        logging.warning(f"Schema unavailable for {doctype}, using header types only: {str(e)}")
+        return {}
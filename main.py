@@ -1,6 +1,7 @@
-from app import app
+from app import app, init_db
 import multiprocessing
 
 if __name__ == "__main__":
     multiprocessing.set_start_method("spawn")
+    init_db()
     app.run(host="0.0.0.0", port=5000, debug=True)
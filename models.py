@@ -3,10 +3,13 @@ import json
 from app import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash
-import requests
+from frappe_api import FrappeClient
 
 
 class ImportJob(db.Model):
+    # Job listings and queue recovery filter by status, newest first
+    __table_args__ = (db.Index('ix_import_job_status_created_at', 'status', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     frappe_url = db.Column(db.String(256), nullable=False)
     doctype = db.Column(db.String(128), nullable=False)
@@ -19,6 +22,54 @@ class ImportJob(db.Model):
     batch_size = db.Column(db.Integer, default=100)
     current_batch = db.Column(db.Integer, default=0)
     file_path = db.Column(db.String(512))  # Store uploaded file path
+    file_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the upload, names its parsed cache
+    connection_id = db.Column(db.Integer, db.ForeignKey('frappe_connection.id'), nullable=True)
+    mapping = db.Column(db.Text)  # JSON column mapping submitted with the import request
+    max_inflight = db.Column(db.Integer, nullable=True)  # Concurrent insert_many batches, defaults to IMPORT_MAX_INFLIGHT_PER_JOB
+    natural_key = db.Column(db.String(140), nullable=True)  # Field identifying existing records when a batch is retried
+    isolate_errors = db.Column(db.Boolean, default=False)  # Bisect rejected batches and skip the failing rows
+    failed_rows = db.Column(db.Integer, default=0)
+    error_file = db.Column(db.String(512))  # CSV of rejected rows with an Error column
+    warning_rows = db.Column(db.Integer, default=0)  # Rows imported, but with something left undone
+    warnings = db.Column(db.Text)  # JSON list of {"row", "message"} for the first of those rows
+    batch_size_history = db.Column(db.Text)  # JSON list of adaptive batch size changes and what caused them
+    run_count = db.Column(db.Integer, default=0)  # Times a worker has claimed the job; above 1 it is being resumed
+    plan_id = db.Column(db.Integer, db.ForeignKey('migration_plan.id'), nullable=True)
+    depends_on = db.Column(db.Text)  # JSON list of ImportJob ids of the plan that must complete first
+
+
+class MigrationPlan(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    connection_id = db.Column(db.Integer, db.ForeignKey('frappe_connection.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ImportBatch(db.Model):
+    __table_args__ = (db.UniqueConstraint('job_id', 'batch_num'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('import_job.id'), nullable=False)
+    batch_num = db.Column(db.Integer, nullable=False)
+    start_row = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(32), default='sent')  # sent, acknowledged or failed
+    names = db.Column(db.Text)  # JSON list of the names Frappe created for this batch
+    error_message = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DocTypeSchema(db.Model):
+    __table_args__ = (db.UniqueConstraint('connection_id', 'doctype'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    connection_id = db.Column(db.Integer, db.ForeignKey('frappe_connection.id'), nullable=False)
+    doctype = db.Column(db.String(128), nullable=False)
+    meta = db.Column(db.Text, nullable=False)  # Raw getdoctype response
+    field_map = db.Column(db.Text, nullable=False)  # JSON {fieldname or table.fieldname: type string}
+    modified = db.Column(db.Text, nullable=False)  # JSON {doctype name: modified} for the doctype and its child tables
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 class FrappeConnection(db.Model):
@@ -34,21 +85,21 @@ class FrappeConnection(db.Model):
         self.password_hash = generate_password_hash(password)
         # Get API key and secret from Frappe
         try:
-            # First authenticate with username/password
-            auth_response = requests.post(
-                f"{self.url}/api/method/login",
+            # First authenticate with username/password; the login client is
+            # not shared since its session carries the user's cookies
+            client = FrappeClient(self.url)
+            auth_response = client.post(
+                "/api/method/login",
                 data={"usr": self.username, "pwd": password}
             )
             if auth_response.ok:
                 # Get API key and secret
-                key_response = requests.post(
-                    f"{self.url}/api/method/frappe.core.doctype.user.user.generate_keys",
-                    data={"user":auth_response.json()["full_name"]},
-                    cookies=auth_response.cookies.get_dict()
+                key_response = client.post(
+                    "/api/method/frappe.core.doctype.user.user.generate_keys",
+                    data={"user":auth_response.json()["full_name"]}
                 )
-                user_response = requests.get(
-                    f"{self.url}/api/resource/User/{auth_response.json()['full_name']}?fields=['*']",
-                    cookies=auth_response.cookies.get_dict(),
+                user_response = client.get(
+                    f"/api/resource/User/{auth_response.json()['full_name']}?fields=['*']"
                 )
                 if user_response.ok:
                     user_data = user_response.json().get('data', {})
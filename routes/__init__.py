@@ -7,3 +7,5 @@ from . import connection
 from . import doctype
 from . import import_routes
 from . import status
+from . import plans
+from . import metrics
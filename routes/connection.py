@@ -2,6 +2,7 @@
 from flask import request, jsonify
 from app import db
 from models import FrappeConnection
+from frappe_api import drop_async_client, drop_client
 from . import api
 
 @api.route('/connect', methods=['POST'])
@@ -55,6 +56,8 @@ def delete_connection(connection_id):
         connection = FrappeConnection.query.get_or_404(connection_id)
         db.session.delete(connection)
         db.session.commit()
+        drop_client(connection_id)
+        drop_async_client(connection_id)
         return jsonify({"status": "success"})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
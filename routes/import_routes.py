@@ -1,15 +1,22 @@
 import json
 import os
-import pandas as pd
-from ImporterMethods.Customer import validate_all
-from flask import request, jsonify
+import uuid
+from ImporterMethods.validator import ColumnValidator
+from flask import request, jsonify, send_file
 from werkzeug.utils import secure_filename
-from app import db
+from app import app, db
 from models import ImportJob
 from . import api
-import requests
 from models import FrappeConnection
-from ImporterMethods.Customer import get_field_mapping
+from import_engine.executor import enqueue, is_resumable, remove_upload
+from import_engine.error_report import error_file_as_xlsx, remove_error_file
+from import_engine.job_store import set_status
+from import_engine.reader import is_supported, read_columns, iter_chunks
+from import_engine import parsed_cache
+from import_engine.batch_sizing import clamp_batch_size
+from import_engine.dispatch import clamp_max_inflight
+from import_engine.dry_run import dry_run_import
+from import_engine.metrics import StageTimer, connection_sink
 
 UPLOAD_FOLDER = 'uploads'
 
@@ -25,150 +32,216 @@ def upload_file():
     conn = FrappeConnection.query.get_or_404(connection_id)
     file = request.files['file']
     filename = secure_filename(file.filename)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    # Uploads outlive failed jobs (for resume), so don't let a re-upload overwrite one
+    filepath = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex[:8]}_{filename}")
+    cache_writer = None
+    # A dry run validates and reports timings but creates no missing Link targets on the site
+    dry_run = request.form.get('dry_run', '').lower() == 'true'
+    timer = StageTimer(connection_sink(conn.id), sample_rss=dry_run)
 
     try:
-        file.save(filepath)
-        if filename.lower().endswith('.csv'):
-            df = pd.read_csv(filepath)
-        elif filename.lower().endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(filepath)
-        else:
+        file_hash = parsed_cache.save_upload(file, filepath)
+        if not is_supported(filename):
             os.remove(filepath)
             return jsonify({"status": "error", "message": "Unsupported file format"}), 400
 
-        validation_errors = validate_all(df.to_dict(orient='records'))
-        if validation_errors:
+        # The same content uploaded before is read from its parsed cache;
+        # otherwise the chunks parsed for validation are spilled to a new one
+        source = parsed_cache.lookup(file_hash) or filepath
+        columns = read_columns(source)
+        if source == filepath:
+            cache_writer = parsed_cache.CacheWriter(file_hash)
+
+        create_missing = request.form.get('create_missing_records', '').lower() == 'true'
+        deferred_links = [
+            doctype.strip() for doctype in request.form.get('deferred_link_doctypes', '').split(',') if doctype.strip()
+        ]
+        validator = ColumnValidator(conn, columns, create_missing, deferred_links)
+        total_rows = 0
+        for chunk in timer.timed('read', iter_chunks(source, app.config["IMPORT_READ_CHUNK_SIZE"])):
+            with timer.stage('validate'):
+                validator.validate(chunk, row_offset=total_rows)
+            if cache_writer:
+                with timer.stage('cache'):
+                    cache_writer.append(chunk)
+            total_rows += len(chunk)
+        if cache_writer:
+            # Kept even if validation fails: the corrected re-upload is often the same file
+            cache_writer.commit(columns)
+            cache_writer = None
+            parsed_cache.prune(_hashes_in_use())
+        if dry_run:
+            missing_links = validator.missing_links()
+        else:
+            with timer.stage('create_links'):
+                validator.create_missing_links()
+
+        if validator.errors:
             os.remove(filepath)
-            raise ValueError(validation_errors)
+            return jsonify({
+                "status": "error",
+                "message": validator.errors.render(),
+                "validation_errors": validator.errors.by_row()
+            }), 400
 
         file_size = os.path.getsize(filepath)
-        optimal_batch_size = 500 if file_size >= 20 * 1024 * 1024 else (
+        # The settings' limits apply with adaptive batching off too
+        optimal_batch_size = clamp_batch_size(500 if file_size >= 20 * 1024 * 1024 else (
             250 if file_size >= 5 * 1024 * 1024 else (
                 100 if file_size >= 1024 * 1024 else 50
             )
-        )
+        ))
 
         job = ImportJob(
             frappe_url=conn.url,
             doctype=request.form.get('doctype'),
-            total_rows=len(df),
+            total_rows=total_rows,
             file_path=filepath,
+            file_hash=file_hash,
             batch_size=optimal_batch_size
         )
         db.session.add(job)
         db.session.commit()
 
-        return jsonify({
+        result = {
             "status": "success",
             "job_id": job.id,
-            "columns": df.columns.tolist(),
-            "total_rows": len(df),
+            "columns": columns,
+            "total_rows": total_rows,
             "batch_size": job.batch_size
-        })
+        }
+        if dry_run:
+            result["dry_run"] = {
+                **timer.report(total_rows),
+                "parsed_from_cache": source != filepath,
+                "missing_links": missing_links,
+            }
+        return jsonify(result)
     except Exception as e:
+        if cache_writer:
+            cache_writer.abort()
         if os.path.exists(filepath):
             os.remove(filepath)
         return jsonify({"status": "error", "message": str(e)}), 400
 
+
+def _hashes_in_use():
+    """Content hashes of jobs that may still read their parsed cache."""
+    rows = db.session.query(ImportJob.file_hash).filter(
+        ImportJob.file_hash.isnot(None),
+        ImportJob.status.notin_(('completed', 'cancelled'))
+    ).distinct()
+    return {file_hash for file_hash, in rows}
+
 @api.route('/import/<job_id>/<conn_id>', methods=['POST'])
 def import_data(job_id, conn_id):
     job = ImportJob.query.get_or_404(job_id)
-    mapping = request.json.get('mapping', {})
+    conn = FrappeConnection.query.get_or_404(conn_id)
 
-    try:
-        if job.file_path.endswith('.csv'):
-            df = pd.read_csv(job.file_path)
-        else:
-            df = pd.read_excel(job.file_path)
+    if job.status != 'pending':
+        return jsonify({"status": "error", "message": f"Job is already {job.status}"}), 409
+    if job.plan_id:
+        return jsonify({"status": "error", "message": f"Job is part of migration plan {job.plan_id}"}), 409
 
-        job.status = 'processing'
+    options = request.json or {}
+    try:
+        configure_job(job, conn, options)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if options.get('dry_run'):
+        # Everything but the insert_many POSTs, synchronously; the job stays pending
+        try:
+            report = dry_run_import(job, conn)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"status": "error", "message": f"Dry run failed: {str(e)}"}), 400
         db.session.commit()
+        return jsonify({"status": "success", "job_id": job.id, "dry_run": report})
 
-        total_batches = (len(df) + job.batch_size - 1) // job.batch_size
-
-        for batch_num in range(total_batches):
-            start_idx = batch_num * job.batch_size
-            end_idx = min((batch_num + 1) * job.batch_size, len(df))
-            batch_df = df.iloc[start_idx:end_idx]
-
-            mapped_data = []
-            for _, row in batch_df.iterrows():
-                record = {}
-                child_tables = {}
-
-                for excel_col in row.index:
-                    fieldname, fieldtype, options = get_field_mapping(excel_col)
-                    
-                    if '.' in fieldname:
-                        parts = fieldname.split('.')
-                        if len(parts) == 3:
-                            table_name, row_num, field_name = parts
-                            row_num = int(row_num)
-
-                            if table_name not in child_tables:
-                                child_tables[table_name] = {}
-
-                            if row_num not in child_tables[table_name]:
-                                child_tables[table_name][row_num] = {}
-
-                            if pd.notna(row[excel_col]) and str(row[excel_col]).strip():
-                                child_tables[table_name][row_num][field_name] = row[excel_col]
-                    else:
-                        if pd.notna(row[excel_col]):
-                            record[fieldname] = row[excel_col]
-
-                for table_name, rows in child_tables.items():
-                    valid_rows = [data for row_num, data in sorted(rows.items()) if data]
-                    if valid_rows:
-                        record[table_name] = valid_rows
-
-                if record:
-                    mapped_data.append(record)
-
-            # Create records in Frappe using insert_many
-            try:
-                # Get connection details from frappe_url
-                conn = FrappeConnection.query.get_or_404(conn_id)
-                if not conn:
-                    raise Exception("Connection not found for the given Frappe URL")
-
-                docs = [{"doctype": job.doctype, **record} for record in mapped_data]
-
-                print(json.dumps(docs))
-
-                response = requests.post(
-                    f"{conn.url}/api/method/frappe.client.insert_many",
-                    json={"docs": docs},
-                    headers={
-                        'Authorization': f'token {conn.api_key}:{conn.api_secret}',
-                        'Content-Type': 'application/json'
-                    }
-                )
-                print("insert response ->>>> ",response.json())
-                if not response.ok:
-                    raise Exception(f"Failed to create records: {response.text}")
-            except Exception as e:
-                raise Exception(f"Error creating records: {str(e)}")
-
-            job.processed_rows = end_idx
-            job.current_batch = batch_num + 1
-            db.session.commit()
-
-        job.status = 'completed'
-        db.session.commit()
+    set_status(job, 'queued')
 
-        if os.path.exists(job.file_path):
-            os.remove(job.file_path)
+    enqueue(job.id)
 
-        return jsonify({"status": "success", "message": "Import completed"})
+    return jsonify({"status": "success", "message": "Import queued", "job_id": job.id}), 202
 
-    except Exception as e:
-        job.status = 'failed'
-        job.error_message = str(e)
-        db.session.commit()
 
-        if os.path.exists(job.file_path):
-            os.remove(job.file_path)
+def configure_job(job, conn, options):
+    """Apply the import options (mapping, max_inflight, natural_key, isolate_errors) to a pending job.
+
+    Raises ValueError for a max_inflight that isn't a positive integer; one
+    above IMPORT_MAX_INFLIGHT_PER_JOB is lowered to it.
+    """
+    if options.get('max_inflight') is not None:
+        try:
+            max_inflight = int(options['max_inflight'])
+        except (TypeError, ValueError):
+            max_inflight = 0
+        if max_inflight < 1:
+            raise ValueError(f"max_inflight must be a positive integer, not {options['max_inflight']!r}")
+        job.max_inflight = clamp_max_inflight(max_inflight)
+    job.connection_id = conn.id
+    job.mapping = json.dumps(options.get('mapping', {}))
+    if options.get('natural_key'):
+        job.natural_key = options['natural_key']
+    job.isolate_errors = bool(options.get('isolate_errors', False))
+
+
+@api.route('/import/<job_id>/resume', methods=['POST'])
+def resume_import(job_id):
+    job = ImportJob.query.get_or_404(job_id)
+    if not is_resumable(job):
+        return jsonify({"status": "error", "message": f"Job is {job.status} and cannot be resumed"}), 409
+    source = parsed_cache.source_path(job)
+    if not source or not os.path.exists(source):
+        return jsonify({"status": "error", "message": "Uploaded file is no longer available"}), 409
+
+    # A batch that failed without a natural key may be on the site already;
+    # with one, the resumed run looks its records up instead of resending them
+    natural_key = (request.get_json(silent=True) or {}).get('natural_key')
+    if natural_key:
+        job.natural_key = natural_key
+    set_status(job, 'queued', error_message=None)
+
+    enqueue(job.id)
+
+    return jsonify({
+        "status": "success",
+        "message": "Import resumed",
+        "job_id": job.id,
+        "resume_from_batch": job.current_batch
+    }), 202
+
+
+@api.route('/import/<job_id>', methods=['DELETE'])
+def discard_import(job_id):
+    job = ImportJob.query.get_or_404(job_id)
+    if job.status in ('queued', 'processing') and not is_resumable(job):
+        return jsonify({"status": "error", "message": f"Job is {job.status}"}), 409
+
+    remove_upload(job)
+    remove_error_file(job)
+    set_status(job, job.status if job.status == 'completed' else 'cancelled')
+    return jsonify({"status": "success"})
+
+
+@api.route('/import/<job_id>/errors', methods=['GET'])
+def download_errors(job_id):
+    job = ImportJob.query.get_or_404(job_id)
+    if not job.error_file or not os.path.exists(job.error_file):
+        return jsonify({"status": "error", "message": "No rejected rows for this job"}), 404
+
+    if request.args.get('format') == 'xlsx':
+        return send_file(
+            error_file_as_xlsx(job.error_file),
+            as_attachment=True,
+            download_name=f'{job.doctype}_import_{job.id}_errors.xlsx',
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    return send_file(
+        os.path.abspath(job.error_file),
+        as_attachment=True,
+        download_name=f'{job.doctype}_import_{job.id}_errors.csv',
+        mimetype='text/csv'
+    )
 
-        return jsonify({"status": "error", "message": str(e)}), 400
\ No newline at end of file
@@ -0,0 +1,10 @@
+from flask import Response
+
+from import_engine.metrics import metrics
+from . import api
+
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text exposition format; numbers are for this process only
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
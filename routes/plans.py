@@ -0,0 +1,77 @@
+import json
+import logging
+from flask import request, jsonify
+from app import db
+from models import FrappeConnection, ImportJob, MigrationPlan
+from import_engine.executor import start_ready_jobs
+from import_engine.migration_plan import PlanError, build_dependencies, plan_status
+from import_engine.progress import job_snapshot
+from .import_routes import configure_job
+from . import api
+
+
+@api.route('/plans', methods=['POST'])
+def create_plan():
+    """Import several uploaded jobs in Link dependency order.
+
+    Body: {"connection_id": 1, "jobs": [{"job_id": 3, "mapping": {...}, ...}, ...]},
+    each entry taking the same options as /api/import.
+    """
+    data = request.json or {}
+    conn = FrappeConnection.query.get_or_404(data.get('connection_id'))
+    steps = data.get('jobs') or []
+    if not steps:
+        return jsonify({"status": "error", "message": "No jobs provided"}), 400
+
+    jobs = []
+    for step in steps:
+        job = ImportJob.query.get_or_404(step.get('job_id'))
+        if job.status != 'pending' or job.plan_id:
+            return jsonify({"status": "error", "message": f"Job {job.id} is already {job.status}"}), 409
+        try:
+            configure_job(job, conn, step)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({"status": "error", "message": f"Job {job.id}: {e}"}), 400
+        jobs.append(job)
+
+    try:
+        dependencies = build_dependencies(conn, jobs)
+    except PlanError as e:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error building migration plan: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    plan = MigrationPlan(connection_id=conn.id)
+    db.session.add(plan)
+    db.session.flush()
+    for job in jobs:
+        job.plan_id = plan.id
+        job.depends_on = json.dumps(dependencies[job.id])
+    db.session.commit()
+
+    started = start_ready_jobs(plan.id)
+
+    return jsonify({
+        "status": "success",
+        "plan_id": plan.id,
+        "dependencies": {str(job_id): deps for job_id, deps in dependencies.items()},
+        "started": started
+    }), 202
+
+
+@api.route('/plans/<int:plan_id>', methods=['GET'])
+def get_plan(plan_id):
+    plan = MigrationPlan.query.get_or_404(plan_id)
+    jobs = ImportJob.query.filter_by(plan_id=plan.id).order_by(ImportJob.id).all()
+    return jsonify({
+        "plan_id": plan.id,
+        "status": plan_status(jobs),
+        "jobs": [
+            {**job_snapshot(job), "doctype": job.doctype, "depends_on": json.loads(job.depends_on or '[]')}
+            for job in jobs
+        ]
+    })
@@ -1,16 +1,64 @@
+import json
 
-from flask import jsonify
+from flask import Response, jsonify, request, stream_with_context
+from app import app, db
 from models import ImportJob
+from import_engine.progress import TERMINAL_STATUSES, bus, cached_snapshot
 from . import api
 
-@api.route('/status/<job_id>', methods=['GET'])
+
+@api.route('/status/<int:job_id>', methods=['GET'])
 def get_status(job_id):
-    job = ImportJob.query.get_or_404(job_id)
-    return jsonify({
-        "status": job.status,
-        "processed_rows": job.processed_rows,
-        "total_rows": job.total_rows,
-        "current_batch": job.current_batch,
-        "total_batches": (job.total_rows + job.batch_size - 1) // job.batch_size if job.batch_size else 0,
-        "error_message": job.error_message
-    })
+    # Served from the progress bus; the database is read at most once per
+    # PROGRESS_CACHE_TTL for jobs that no worker of this process is running
+    latest = cached_snapshot(job_id, lambda: _load_job(job_id))
+    if latest is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(latest[1])
+
+
+@api.route('/status/<int:job_id>/stream', methods=['GET'])
+def stream_status(job_id):
+    """Server-sent events with a job snapshot per acknowledged batch or state change.
+
+    The stream ends after the job reaches a terminal status.
+    """
+    latest = cached_snapshot(job_id, lambda: _load_job(job_id))
+    if latest is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    def events():
+        seq, snapshot = latest
+        yield _event(seq, snapshot)
+        while snapshot['status'] not in TERMINAL_STATUSES:
+            update = bus.wait(job_id, seq, timeout=app.config["PROGRESS_CACHE_TTL"])
+            if update is None:
+                # No publisher in this process; fall back to the database
+                update = cached_snapshot(job_id, lambda: _load_job(job_id))
+                if update is None:
+                    return
+            if update[0] == seq:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            seq, snapshot = update
+            yield _event(seq, snapshot)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _load_job(job_id):
+    try:
+        return db.session.get(ImportJob, job_id)
+    finally:
+        # Watchers hold their stream open for the whole import; don't keep a
+        # connection checked out (or stale identity-map rows) in between
+        db.session.close()
+
+
+def _event(seq, snapshot):
+    return f"id: {seq}\nevent: progress\ndata: {json.dumps(snapshot)}\n\n"
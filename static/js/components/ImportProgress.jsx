@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getImportStatus } from '../services/api';
+import { getImportStatus, subscribeImportStatus } from '../services/api';
 
 function ImportProgress({ jobId }) {
   const [status, setStatus] = useState({
@@ -8,17 +8,29 @@ function ImportProgress({ jobId }) {
     total_rows: 0,
     current_batch: 0,
     total_batches: 0,
+    rows_per_sec: null,
+    eta_seconds: null,
+    failed_rows: 0,
+    warning_rows: 0,
+    warnings: [],
     error_message: null
   });
 
   useEffect(() => {
+    let timer = null;
+    let unsubscribe = null;
+
+    const isDone = (response) =>
+      ['completed', 'failed', 'cancelled'].includes(response.status);
+
+    // Fallback when the browser has no EventSource or the stream drops
     const checkStatus = async () => {
       try {
         const response = await getImportStatus(jobId);
         setStatus(response);
 
-        if (response.status !== 'completed' && response.status !== 'failed') {
-          setTimeout(checkStatus, 2000);
+        if (!isDone(response)) {
+          timer = setTimeout(checkStatus, 2000);
         }
       } catch (err) {
         setStatus(prev => ({
@@ -29,9 +41,39 @@ function ImportProgress({ jobId }) {
       }
     };
 
-    checkStatus();
+    if (window.EventSource) {
+      let finished = false;
+      unsubscribe = subscribeImportStatus(
+        jobId,
+        (response) => {
+          setStatus(response);
+          finished = isDone(response);
+        },
+        () => {
+          if (!finished) {
+            checkStatus();
+          }
+        }
+      );
+    } else {
+      checkStatus();
+    }
+
+    return () => {
+      clearTimeout(timer);
+      if (unsubscribe) {
+        unsubscribe();
+      }
+    };
   }, [jobId]);
 
+  const formatEta = (seconds) => {
+    if (seconds < 60) return `${seconds}s`;
+    const minutes = Math.floor(seconds / 60);
+    if (minutes < 60) return `${minutes}m ${seconds % 60}s`;
+    return `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
+  };
+
   const getProgressPercentage = () => {
     if (status.total_rows === 0) return 0;
     return Math.round((status.processed_rows / status.total_rows) * 100);
@@ -59,6 +101,32 @@ function ImportProgress({ jobId }) {
           <p>Status: {status.status}</p>
           <p>Processed: {status.processed_rows} / {status.total_rows} rows</p>
           <p>Current Batch: {status.current_batch} / {status.total_batches}</p>
+          {status.rows_per_sec != null && (
+            <p>Speed: {status.rows_per_sec} rows/s</p>
+          )}
+          {status.eta_seconds != null && (
+            <p>Time remaining: {formatEta(status.eta_seconds)}</p>
+          )}
+
+          {status.failed_rows > 0 && (
+            <div className="alert alert-warning">
+              {status.failed_rows} row(s) were rejected.{' '}
+              {status.error_file_url && (
+                <a href={status.error_file_url}>Download rejected rows</a>
+              )}
+            </div>
+          )}
+
+          {status.warning_rows > 0 && (
+            <div className="alert alert-info">
+              {status.warning_rows} row(s) were imported with warnings; don't re-upload them.
+              <ul>
+                {status.warnings.map((warning) => (
+                  <li key={warning.row}>Row {warning.row}: {warning.message}</li>
+                ))}
+              </ul>
+            </div>
+          )}
 
           {status.error_message && (
             <div className="alert alert-danger">
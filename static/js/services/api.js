@@ -68,4 +68,16 @@ export async function getImportStatus(jobId) {
     credentials: 'include'
   });
   return response.json();
-}
\ No newline at end of file
+}
+
+export function subscribeImportStatus(jobId, onUpdate, onError) {
+  const source = new EventSource(`${API_BASE_URL}/status/${jobId}/stream`, {
+    withCredentials: true
+  });
+  source.addEventListener('progress', (event) => onUpdate(JSON.parse(event.data)));
+  source.onerror = (event) => {
+    source.close();
+    onError(event);
+  };
+  return () => source.close();
+}
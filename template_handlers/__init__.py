@@ -1,15 +1,38 @@
 
-from abc import ABC, abstractmethod
-from numpy import void
+from abc import ABC
 import pandas as pd
-from typing import Tuple, Optional
+from typing import List, Optional, Tuple
+
+from ImporterMethods.Customer import get_field_mapping
 
 class TemplateHandler(ABC):
+    """Base class for doctype-specific template handlers
+
+    Lifecycle: get_fields() adds the handler's columns to the generated
+    template. During an import every batch is split by process_template();
+    the main frame becomes the doctype's records and, once a batch is on the
+    site, import_filtered_data() creates the related records from the
+    filtered frame.
+
+    Handlers are found by template_handlers.registry and one instance per
+    doctype is shared by all requests and import workers, so they must not
+    keep per-request state. Most handlers only need to declare:
+
+        doctype: The doctype the handler is for
+        extra_columns: Template columns added to the selected fields
+        split_prefixes: Column prefixes (e.g. "customer_primary_address")
+            whose columns process_template() splits off, renamed to their
+            fieldnames, for import_filtered_data()
+        name_key: Field telling the doctype's records of one batch apart when
+            there is no natural key, so that import_filtered_data() gets each
+            row's name (insert_many doesn't return them in row order)
+    """
+
+    doctype: str = ''
+    extra_columns: Tuple[str, ...] = ()
+    split_prefixes: Tuple[str, ...] = ()
+    name_key: Optional[str] = None
 
-    connection_id: str
-    
-    """Base class for doctype-specific template handlers"""
-    
     def get_fields(self, selected_fields=None) -> list:
         """Return list of fields to include in the template
         
@@ -19,23 +42,44 @@ class TemplateHandler(ABC):
         Returns:
             list: List of field definitions
         """
-        if not selected_fields:
-            return []
-            
         # Get base selected fields
-        return selected_fields.copy()
+        fields = list(selected_fields or [])
+        return fields + [column for column in self.extra_columns if column not in fields]
 
-    @abstractmethod
     def process_template(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
-        """Process the template dataframe before saving
+        """Split a batch before it is mapped to docs
         
         Args:
-            df: Template dataframe with columns from get_fields()
+            df: Batch dataframe with the upload's columns
             
         Returns:
             Tuple[DataFrame, Optional[DataFrame]]: 
-                - First DataFrame: Main processed template dataframe
-                - Second DataFrame: Optional filtered dataframe for child tables/special handling
+                - First DataFrame: Columns imported as the doctype's records
+                - Second DataFrame: Optional filtered dataframe for child tables/special handling,
+                  row-aligned with the first
+        """
+        prefixes = tuple(f"{prefix}." for prefix in self.split_prefixes)
+        split_columns = [column for column in df.columns if prefixes and get_field_mapping(column)[0].startswith(prefixes)]
+        if not split_columns:
+            return df, None
+
+        df_filtered = df[split_columns].rename(columns=lambda column: get_field_mapping(column)[0])
+        return df.drop(columns=split_columns), df_filtered
+
+    def import_filtered_data(self, send, filtered_df: pd.DataFrame, names: pd.Series) -> List[Tuple[int, str]]:
+        """Create the related records of a batch that has been inserted
+
+        Args:
+            send: Callable inserting a list of docs in bulk, returning
+                ([(doc, name), ...], [(doc, error message), ...])
+            filtered_df: Second frame returned by process_template() for the batch
+            names: Name of the record created from each row (by position), None
+                for rows that weren't inserted or whose name couldn't be matched
+
+        Returns:
+            list: (row position, error message) for rows whose related records failed
         """
-        return df, None
+        return []
+
 
+from .registry import get_template_handler, register_handler  # noqa: E402
@@ -0,0 +1,95 @@
+import importlib
+import logging
+import os
+import pkgutil
+import re
+import threading
+from importlib.metadata import entry_points
+
+from . import TemplateHandler
+
+# Handlers are looked up by doctype and imported on first use, so adding one
+# costs nothing at startup or for the other doctypes. Two sources:
+#   - modules of this package named after the doctype, "<doctype>_handler.py"
+#     in snake case (Sales Order -> sales_order_handler.py), defining a
+#     TemplateHandler subclass whose doctype attribute is the doctype;
+#   - the ENTRY_POINT_GROUP entry points of installed packages, named after
+#     the doctype and pointing at the handler class ("pkg.module:Class").
+# Entry points win over modules here. Only module names and entry point
+# specs are read at discovery; both are listed once per process. Instances
+# are created once per doctype and shared.
+
+ENTRY_POINT_GROUP = 'frappe_importer.template_handlers'
+MODULE_SUFFIX = '_handler'
+
+_lock = threading.Lock()
+# doctype key -> module path or entry point, filled on the first lookup
+_sources = None
+# doctype key -> handler instance, None when the doctype has no handler
+_instances = {}
+
+
+def get_template_handler(doctype):
+    """Shared TemplateHandler instance for the doctype, or None."""
+    key = _doctype_key(doctype)
+    try:
+        return _instances[key]
+    except KeyError:
+        pass
+
+    with _lock:
+        if key not in _instances:
+            _instances[key] = _load(doctype)
+        return _instances[key]
+
+
+def register_handler(doctype, handler_class):
+    """Use handler_class for the doctype, e.g. from a plugin without entry points."""
+    with _lock:
+        _discover()[_doctype_key(doctype)] = handler_class
+        _instances.pop(_doctype_key(doctype), None)
+
+
+def _load(doctype):
+    source = _discover().get(_doctype_key(doctype))
+    if source is None:
+        return None
+    try:
+        if isinstance(source, str):
+            handler_class = _handler_class(importlib.import_module(source), doctype)
+        elif isinstance(source, type):
+            handler_class = source
+        else:
+            handler_class = source.load()
+        return handler_class()
+    except Exception as e:
+        # A broken plugin shouldn't take template downloads and imports down with it
+        logging.error(f"Failed to load template handler for {doctype}: {str(e)}")
+        return None
+
+
+def _discover():
+    global _sources
+    if _sources is None:
+        sources = {
+            _doctype_key(module.name[:-len(MODULE_SUFFIX)]): f"{__package__}.{module.name}"
+            for module in pkgutil.iter_modules([os.path.dirname(__file__)])
+            if module.name.endswith(MODULE_SUFFIX)
+        }
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            sources[_doctype_key(entry_point.name)] = entry_point
+        _sources = sources
+    return _sources
+
+
+def _handler_class(module, doctype):
+    for value in vars(module).values():
+        if (isinstance(value, type) and issubclass(value, TemplateHandler)
+                and value.__module__ == module.__name__ and _doctype_key(value.doctype) == _doctype_key(doctype)):
+            return value
+    raise LookupError(f"{module.__name__} defines no TemplateHandler for {doctype}")
+
+
+def _doctype_key(doctype):
+    # "Sales Order", "sales_order" and "sales-order" name the same handler
+    return re.sub(r'[\s\-]+', '_', doctype.strip()).lower()
@@ -0,0 +1,117 @@
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# Tests run the app against a throwaway SQLite database and uploads folder,
+# and against benchmarks/mock_frappe.py as the Frappe site
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+WORKDIR = tempfile.mkdtemp(prefix="importer_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+# Retried batches back off for milliseconds rather than seconds
+os.environ["IMPORT_BACKOFF_BASE"] = "0.01"
+os.chdir(WORKDIR)
+os.makedirs("uploads", exist_ok=True)
+
+from app import app, db, init_db  # noqa: E402
+from models import FrappeConnection  # noqa: E402
+from mock_frappe import MockFrappe  # noqa: E402
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    init_db()
+    yield
+
+
+@pytest.fixture
+def site():
+    mock = MockFrappe().start()
+    yield mock
+    mock.stop()
+
+
+@pytest.fixture
+def importer(site):
+    return Importer(site)
+
+
+class Importer:
+    """Drives uploads and imports through the API against a mock site."""
+
+    def __init__(self, site):
+        self.site = site
+        self.client = app.test_client()
+        with app.app_context():
+            conn = FrappeConnection(url=site.url, username="test", password_hash="-", api_key="k", api_secret="s")
+            db.session.add(conn)
+            db.session.commit()
+            self.connection_id = conn.id
+
+    def upload(self, csv_text, doctype='Customer', **form):
+        response = self.client.post('/api/upload', data={
+            'connection_id': str(self.connection_id),
+            'doctype': doctype,
+            'file': (io.BytesIO(csv_text.encode()), 'upload.csv'),
+            **form,
+        }, content_type='multipart/form-data')
+        assert response.status_code == 200, response.json
+        return response.json
+
+    def start(self, job_id, **options):
+        response = self.client.post(f'/api/import/{job_id}/{self.connection_id}', json=options)
+        assert response.status_code in (200, 202), response.json
+        return response.json
+
+    def resume(self, job_id, **options):
+        response = self.client.post(f'/api/import/{job_id}/resume', json=options)
+        assert response.status_code == 202, response.json
+        return self.wait(job_id)
+
+    def wait(self, job_id, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.status(job_id)
+            if status['status'] in TERMINAL_STATUSES:
+                return status
+            time.sleep(0.05)
+        raise AssertionError(f"Job {job_id} still {status['status']} after {timeout}s")
+
+    def run(self, csv_text, doctype='Customer', **options):
+        """Upload and import csv_text; returns the final status."""
+        job_id = self.upload(csv_text, doctype)['job_id']
+        self.start(job_id, **options)
+        return self.wait(job_id)
+
+    def status(self, job_id):
+        return self.client.get(f'/api/status/{job_id}').json
+
+    def error_rows(self, job_id):
+        """Rows of the job's error file, as dicts."""
+        response = self.client.get(f'/api/import/{job_id}/errors')
+        if response.status_code == 404:
+            return []
+        return list(csv.DictReader(io.StringIO(response.data.decode())))
+
+
+def customer_csv(rows, addresses=False):
+    """Customer upload of rows [(customer_name, city or None), ...]."""
+    header = ["customer_name [Data]", "customer_group [Link] [Customer Group]"]
+    if addresses:
+        header += ["customer_primary_address.address_line1 [Data]", "customer_primary_address.city [Data]"]
+    lines = [",".join(header)]
+    for name, city in rows:
+        values = [name, "Commercial"]
+        if addresses:
+            values += [f"1 {city} Road" if city else "", city or ""]
+        lines.append(",".join(values))
+    return "\n".join(lines) + "\n"
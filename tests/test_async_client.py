@@ -0,0 +1,56 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app import app
+from frappe_api import AsyncFrappeClient, RedirectError, io_loop
+
+
+def test_insert_many_sends_an_encoded_payload(site, monkeypatch):
+    # Large enough to be gzipped and sent in several chunks
+    monkeypatch.setitem(app.config, "FRAPPE_GZIP_MIN_BYTES", 1024)
+    client = AsyncFrappeClient(site.url)
+    docs = [{"doctype": "Customer", "customer_name": f"Customer {i}"} for i in range(200)]
+
+    response = io_loop.run(client.insert_many(docs))
+
+    assert response.ok
+    assert len(response.json()['message']) == len(docs)
+    response = io_loop.run(client.get_list("Customer", [["customer_name", "=", "Customer 7"]], ["customer_name"]))
+    assert response.json()['message'] == [{"customer_name": "Customer 7"}]
+    io_loop.run(client.close())
+
+
+class _Redirect(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(301)
+        self.send_header('Location', 'https://erp.example.com/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_redirects_are_not_followed():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Redirect)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = AsyncFrappeClient(f"http://127.0.0.1:{server.server_address[1]}")
+
+    with pytest.raises(RedirectError, match="erp.example.com"):
+        io_loop.run(client.get_doctype("Customer"))
+    io_loop.run(client.close())
+    server.shutdown()
+    server.server_close()
+
+
+def test_network_errors_are_requests_errors(monkeypatch):
+    monkeypatch.setitem(app.config, "FRAPPE_HTTP_RETRIES", 0)
+    # Nothing listens on port 1
+    client = AsyncFrappeClient("http://127.0.0.1:1")
+
+    with pytest.raises(requests.ConnectionError):
+        io_loop.run(client.get_doctype("Customer"))
+    io_loop.run(client.close())
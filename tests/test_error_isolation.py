@@ -0,0 +1,20 @@
+from conftest import customer_csv
+
+REJECTED = {'Customer 3', 'Customer 64', 'Customer 65', 'Customer 199'}
+
+
+def test_rejected_rows_are_isolated(importer, monkeypatch):
+    rows = [(f"Customer {i}", None) for i in range(200)]
+    monkeypatch.setattr(importer.site, '_rejects', lambda doc: doc['customer_name'] in REJECTED)
+
+    status = importer.run(customer_csv(rows), isolate_errors=True)
+
+    assert status['status'] == 'completed', status['error_message']
+    assert status['processed_rows'] == len(rows)
+    assert status['failed_rows'] == len(REJECTED)
+    error_rows = importer.error_rows(status['job_id'])
+    assert {row['customer_name [Data]'] for row in error_rows} == REJECTED
+    assert all(row['Error'].startswith('frappe.exceptions.ValidationError') for row in error_rows)
+    # Every other doc went in, once
+    inserted = sorted(doc['customer_name'] for doc in importer.site.docs('Customer'))
+    assert inserted == sorted(name for name, _ in rows if name not in REJECTED)
@@ -0,0 +1,28 @@
+import pytest
+
+from app import app
+from conftest import customer_csv
+from models import ImportJob
+
+
+@pytest.mark.parametrize('max_inflight', ['many', 0, -2, [4]])
+def test_invalid_max_inflight_is_rejected(importer, max_inflight):
+    job_id = importer.upload(customer_csv([("Customer 1", None)]))['job_id']
+
+    response = importer.client.post(f'/api/import/{job_id}/{importer.connection_id}', json={
+        'max_inflight': max_inflight,
+    })
+
+    assert response.status_code == 400
+    assert 'max_inflight' in response.json['message']
+    assert importer.status(job_id)['status'] == 'pending'
+
+
+def test_max_inflight_is_clamped_to_the_job_limit(importer):
+    job_id = importer.upload(customer_csv([("Customer 1", None)]))['job_id']
+
+    importer.start(job_id, max_inflight='1000')
+
+    with app.app_context():
+        assert ImportJob.query.get(job_id).max_inflight == app.config["IMPORT_MAX_INFLIGHT_PER_JOB"]
+    assert importer.wait(job_id)['status'] == 'completed'
@@ -0,0 +1,57 @@
+from conftest import customer_csv
+
+
+def test_customer_addresses_without_isolation(importer):
+    rows = [(f"Customer {i}", f"City {i}") for i in range(120)]
+    # Same name twice: insert_many's names can't be told apart for these two
+    rows += [("Twin", "North"), ("Twin", "South")]
+
+    status = importer.run(customer_csv(rows, addresses=True))
+
+    assert status['status'] == 'completed', status['error_message']
+    assert status['processed_rows'] == len(rows)
+    # Both twins are on the site: warnings, not rows to fix and re-upload
+    assert status['failed_rows'] == 0
+    assert importer.error_rows(status['job_id']) == []
+    assert status['warning_rows'] == 2
+    assert [warning['row'] for warning in status['warnings']] == [121, 122]
+    customers = importer.site.docs('Customer')
+    assert len(customers) == len(rows)
+    customer_of = {doc['name']: doc['customer_name'] for doc in customers}
+    addresses = importer.site.docs('Address')
+    assert len(addresses) == 120
+    for address in addresses:
+        customer = customer_of[address['links'][0]['link_name']]
+        assert address['city'] == customer.replace('Customer', 'City')
+
+
+def test_customer_addresses_with_isolation(importer):
+    rows = [(f"Customer {i}", f"City {i}" if i % 3 else None) for i in range(90)]
+
+    status = importer.run(customer_csv(rows, addresses=True), isolate_errors=True)
+
+    assert status['status'] == 'completed', status['error_message']
+    assert status['failed_rows'] == 0
+    assert len(importer.site.docs('Customer')) == 90
+    customer_of = {doc['name']: doc['customer_name'] for doc in importer.site.docs('Customer')}
+    addresses = importer.site.docs('Address')
+    assert len(addresses) == 60
+    assert all(customer_of[a['links'][0]['link_name']].replace('Customer', 'City') == a['city'] for a in addresses)
+
+
+def test_failed_addresses_keep_the_batch_acknowledged(importer, monkeypatch):
+    rows = [(f"Customer {i}", f"City {i}") for i in range(120)]
+    # Outside isolation mode a rejected Address fails its whole insert_many
+    monkeypatch.setattr(importer.site, '_rejects', lambda doc: doc.get('city') == 'City 7')
+
+    status = importer.run(customer_csv(rows, addresses=True))
+
+    assert status['status'] == 'completed', status['error_message']
+    assert status['processed_rows'] == len(rows)
+    # Every customer went in once, so the batch was acknowledged rather than failed
+    assert sorted(doc['customer_name'] for doc in importer.site.docs('Customer')) == sorted(name for name, _ in rows)
+    error_rows = importer.error_rows(status['job_id'])
+    assert status['failed_rows'] == len(error_rows) > 0
+    assert 'Customer 7' in [row['customer_name [Data]'] for row in error_rows]
+    assert all('related records failed' in row['Error'] for row in error_rows)
+    assert len(importer.site.docs('Address')) == len(rows) - len(error_rows)
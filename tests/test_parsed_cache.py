@@ -0,0 +1,47 @@
+import shutil
+import uuid
+
+from app import app
+from conftest import customer_csv
+from import_engine import parsed_cache
+from models import ImportJob
+
+
+def _unique_csv():
+    # Caches are shared by content, so each test uploads content of its own
+    marker = uuid.uuid4().hex[:8]
+    return customer_csv([(f"Customer {marker} {i}", None) for i in range(150)])
+
+
+def test_same_upload_is_read_from_the_cache(importer):
+    csv_text = _unique_csv()
+
+    first = importer.upload(csv_text, dry_run='true')
+    second = importer.upload(csv_text, dry_run='true')
+
+    assert first['dry_run']['parsed_from_cache'] is False
+    assert second['dry_run']['parsed_from_cache'] is True
+    assert second['columns'] == first['columns']
+    assert second['total_rows'] == first['total_rows'] == 150
+
+    importer.start(second['job_id'])
+    status = importer.wait(second['job_id'])
+
+    assert status['status'] == 'completed', status['error_message']
+    assert len(importer.site.docs('Customer')) == 150
+
+
+def test_import_reads_the_upload_when_the_cache_is_gone(importer):
+    upload = importer.upload(_unique_csv())
+    with app.app_context():
+        file_hash = ImportJob.query.get(upload['job_id']).file_hash
+    cache = parsed_cache.lookup(file_hash)
+    assert cache is not None
+    shutil.rmtree(cache)
+    assert parsed_cache.lookup(file_hash) is None
+
+    importer.start(upload['job_id'])
+    status = importer.wait(upload['job_id'])
+
+    assert status['status'] == 'completed', status['error_message']
+    assert len(importer.site.docs('Customer')) == 150
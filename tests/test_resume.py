@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import customer_csv
+
+
+@pytest.mark.parametrize('natural_key', [None, 'customer_name'])
+def test_resume_after_a_failed_batch(importer, monkeypatch, natural_key):
+    rows = [(f"Customer {i}", None) for i in range(300)]
+    # Outside isolation mode a rejected doc fails its batch, which stops the job
+    monkeypatch.setattr(importer.site, '_rejects', lambda doc: doc['customer_name'] == 'Customer 150')
+    options = {'natural_key': natural_key} if natural_key else {}
+
+    status = importer.run(customer_csv(rows), **options)
+
+    assert status['status'] == 'failed'
+    assert 'Rejected Customer 150' in status['error_message']
+    assert 0 < len(importer.site.docs('Customer')) < len(rows)
+
+    monkeypatch.setattr(importer.site, '_rejects', lambda doc: False)
+    status = importer.resume(status['job_id'])
+
+    assert status['status'] == 'completed', status['error_message']
+    assert status['processed_rows'] == len(rows)
+    # The batches acknowledged before the failure were not sent again
+    assert sorted(doc['customer_name'] for doc in importer.site.docs('Customer')) == sorted(name for name, _ in rows)
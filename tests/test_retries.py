@@ -0,0 +1,29 @@
+from conftest import customer_csv
+
+
+def test_lost_responses_are_not_retried_without_a_natural_key(importer):
+    rows = [(f"Customer {i}", None) for i in range(200)]
+    # Every insert_many is committed, then answered 502
+    importer.site.lost_rate = 1.0
+
+    status = importer.run(customer_csv(rows))
+
+    assert status['status'] == 'failed'
+    assert 'natural_key' in status['error_message']
+    customers = [doc['customer_name'] for doc in importer.site.docs('Customer')]
+    assert len(customers) == len(set(customers)) > 0
+
+    status = importer.resume(status['job_id'], natural_key='customer_name')
+
+    assert status['status'] == 'completed', status['error_message']
+    assert sorted(doc['customer_name'] for doc in importer.site.docs('Customer')) == sorted(name for name, _ in rows)
+
+
+def test_lost_responses_are_retried_with_a_natural_key(importer):
+    rows = [(f"Customer {i}", None) for i in range(200)]
+    importer.site.lost_rate = 1.0
+
+    status = importer.run(customer_csv(rows), natural_key='customer_name')
+
+    assert status['status'] == 'completed', status['error_message']
+    assert sorted(doc['customer_name'] for doc in importer.site.docs('Customer')) == sorted(name for name, _ in rows)